@@ -1,6 +1,15 @@
+import re
 import sys
 import av
-from vidfile_iterator import FileFrameIterator
+from av.bitstream import BitStreamFilterContext
+from vidfile_iterator import FileFrameIterator, open_video_container
+
+# Codecs with an <codec>_mp4toannexb bitstream filter
+ANNEXB_CODECS = {"h264", "hevc"}
+# Containers (by format long_name) that store those codecs length-prefixed rather than as Annex B
+MP4_LIKE_CONTAINER_LONG_NAMES = {"QuickTime / MOV", "MP4 (MPEG-4 Part 14)", "Matroska / WebM", "FLV (Flash Video)"}
+# Codec context attribute names worth listing
+RELEVANT_METHOD_PATTERN = re.compile(r'send|receive|decode', re.IGNORECASE)
 
 def check_codec_context_methods():
     """Check what methods are available on the codec context"""
@@ -11,23 +20,40 @@ def check_codec_context_methods():
     filename = sys.argv[1]
     print(f"PyAV version: {av.__version__}")
     
-    # Open container and get codec context
-    container = av.open(filename)
+    # Open container (with a hardware decoder if one is available) and get codec context
+    container, hwaccel_device = open_video_container(filename)
     video_stream = container.streams.video[0]
     codec_context = video_stream.codec_context
     
     print(f"Codec context type: {type(codec_context)}")
     print(f"Codec name: {codec_context.name}")
+    print(f"Hardware acceleration: {hwaccel_device or 'none (software decoding)'}")
+    print(f"Codec context is_hwaccel: {codec_context.is_hwaccel}")
+    
+    # H.264/HEVC in MP4-style containers is stored length-prefixed (AVCC) and needs
+    # <codec>_mp4toannexb before going to an Annex B consumer; raw Annex B streams must not get it
+    container_long_name = container.format.long_name
+    needs_annexb_filter = (codec_context.name in ANNEXB_CODECS
+                           and container_long_name in MP4_LIKE_CONTAINER_LONG_NAMES)
+    print(f"\nContainer format: {container_long_name}")
+    print(f"Needs {codec_context.name}_mp4toannexb bitstream filter: {needs_annexb_filter}")
+    if needs_annexb_filter:
+        bsf = BitStreamFilterContext(f"{codec_context.name}_mp4toannexb", video_stream)
+        print(f"Created bitstream filter: {bsf}")
+    
+    # Collect the attribute names once and answer the checks below from that set
+    codec_context_attrs = set(dir(codec_context))
     
     # Check for send/receive methods
-    print(f"\nHas 'send' method: {hasattr(codec_context, 'send')}")
-    print(f"Has 'receive' method: {hasattr(codec_context, 'receive')}")
+    print(f"\nHas 'send' method: {'send' in codec_context_attrs}")
+    print(f"Has 'receive' method: {'receive' in codec_context_attrs}")
     
     # Check for decode method
-    print(f"Has 'decode' method: {hasattr(codec_context, 'decode')}")
+    print(f"Has 'decode' method: {'decode' in codec_context_attrs}")
     
     # List all methods that contain 'send', 'receive', or 'decode'
-    methods = [attr for attr in dir(codec_context) if any(x in attr.lower() for x in ['send', 'receive', 'decode']) and callable(getattr(codec_context, attr))]
+    methods = [attr for attr in sorted(codec_context_attrs)
+               if not attr.startswith('__') and RELEVANT_METHOD_PATTERN.search(attr) and callable(getattr(codec_context, attr))]
     print(f"\nRelevant methods: {methods}")
     
     # Check packet methods
@@ -41,10 +67,12 @@ def check_codec_context_methods():
     # Try the old packet.decode() method
     print(f"\nTesting packet.decode() method...")
     try:
-        frames = list(packet.decode())
-        print(f"Success! Got {len(frames)} frames from packet.decode()")
-        for i, frame in enumerate(frames):
+        # Iterate the decoded frames directly instead of copying them into a list first
+        frame_count = 0
+        for i, frame in enumerate(packet.decode()):
             print(f"  Frame {i}: PTS={frame.pts}")
+            frame_count += 1
+        print(f"Success! Got {frame_count} frames from packet.decode()")
     except Exception as e:
         print(f"Error with packet.decode(): {e}")
 
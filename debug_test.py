@@ -3,100 +3,170 @@
 Debug script to see what's happening with packet filtering and frame decoding.
 """
 
+import os
 import sys
+import av
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from vidfile_iterator import *
 
+def _write_lines(lines):
+    """Write debug output lines with a single stdout write instead of one print() each."""
+    text = "\n".join(lines)
+    if text:
+        sys.stdout.write(text + "\n")
+
 def debug_packet_filtering(filename: str):
     """Debug the packet filtering process step by step."""
     print("=== DEBUGGING PACKET FILTERING ===")
     
-    # Create the frame iterator
-    frame_iterator = FileFrameIterator(filename)
+    # Open the file once; each test below rewinds it instead of re-opening.
+    # Filtering only looks at packet size and number, so nothing needs decoding,
+    # and the file is read into memory once for the repeated passes.
+    frame_iterator = FileFrameIterator(filename, metadata_only=True, in_memory=True)
     
     # Test the first filter
     max_packet_size = 2000
+    max_groups = 5
+    # partial() binds max_size without an extra Python-level lambda frame per packet
+    small_packet_filter = partial(filter_small_packets, max_size=max_packet_size)
     print(f"Filtering packets smaller than {max_packet_size} bytes...")
     
     # Count packets in original stream
-    original_count = 0
-    for packet_data in frame_iterator.iterator:
-        original_count += 1
-        if original_count >= 20:  # Only check first 20
-            break
+    original_count = sum(1 for _ in islice(frame_iterator.iterator, 20))
     
     print(f"Original stream has at least {original_count} packets")
     
     # Test first filter
-    frame_iterator = FileFrameIterator(filename)  # Reset
+    frame_iterator.rewind()
     filtered_iterator = filter_stream_preserve_consecutivity(
         frame_iterator.iterator, 
-        lambda x: filter_small_packets(x, max_packet_size)
+        small_packet_filter
     )
     
     first_filter_count = 0
-    for it, pd_it in enumerate(filtered_iterator):
-        group_packets = list(pd_it)
-        print(f"First filter - Group {it}: {len(group_packets)} packets")
-        if group_packets:
-            packet_no, packet = group_packets[0]
-            print(f"  First packet: {packet_no}, size: {packet.size}")
+    lines = []  # Collected and written once per loop rather than one print() per line
+    # islice stops pulling groups (and therefore demuxing) after max_groups
+    for it, pd_it in enumerate(islice(filtered_iterator, max_groups)):
+        packet_numbers, packets = split_packet_data(pd_it)
+        lines.append(f"First filter - Group {it}: {len(packets)} packets")
+        if packets:
+            lines.append(f"  First packet: {packet_numbers[0]}, size: {packets[0].size}")
         first_filter_count += 1
-        if first_filter_count >= 5:
-            break
+    _write_lines(lines)
     
     print(f"First filter created {first_filter_count} groups")
     
-    # Test second filter
-    frame_iterator = FileFrameIterator(filename)  # Reset
-    filtered_iterator = filter_stream_preserve_consecutivity(
-        frame_iterator.iterator, 
-        lambda x: filter_small_packets(x, max_packet_size)
-    )
+    # Test second filter: small packets among the first 100. Both conditions go into
+    # one predicate, so the stream is filtered and grouped in a single pass rather than
+    # re-grouping the output of the first filter.
+    frame_iterator.rewind()
     filtered_iterator_2 = filter_stream_preserve_consecutivity(
-        filtered_iterator, 
-        lambda x: x[0] < 100
+        frame_iterator.iterator, 
+        lambda x: x[1].size < max_packet_size and x[0] < 100
     )
     
     second_filter_count = 0
-    for it, pd_it in enumerate(filtered_iterator_2):
-        group_packets = list(pd_it)
-        print(f"Second filter - Group {it}: {len(group_packets)} packets")
-        if group_packets:
-            packet_no, packet = group_packets[0]
-            print(f"  First packet: {packet_no}, size: {packet.size}")
+    lines = []
+    for it, pd_it in enumerate(islice(filtered_iterator_2, max_groups)):
+        packet_numbers, packets = split_packet_data(pd_it)
+        lines.append(f"Second filter - Group {it}: {len(packets)} packets")
+        if packets:
+            lines.append(f"  First packet: {packet_numbers[0]}, size: {packets[0].size}")
         second_filter_count += 1
-        if second_filter_count >= 5:
-            break
+    _write_lines(lines)
     
     print(f"Second filter created {second_filter_count} groups")
+    
+    # Same as the second filter, but vectorized over the first 100 packets' metadata at once;
+    # islice stops demuxing there, as the second filter's packet_no < 100 check does
+    frame_iterator.rewind()
+    packet_numbers, packets = split_packet_data(islice(frame_iterator.iterator, 100))
+    sizes = np.fromiter((packet.size for packet in packets), dtype=np.int64, count=len(packets))
+    runs = consecutive_filtered_runs(packet_numbers, sizes < max_packet_size)
+    lines = []
+    for it, (start, end) in enumerate(runs[:max_groups]):
+        lines.append(f"Vectorized filter - Group {it}: {end - start} packets")
+        lines.append(f"  First packet: {packet_numbers[start]}, size: {sizes[start]}")
+    _write_lines(lines)
+    print(f"Vectorized filter found {len(runs)} groups in {len(packets)} packets")
+    frame_iterator.close()
 
-def debug_frame_decoding(filename: str):
-    """Debug frame decoding with a simple packet."""
+def debug_frame_decoding(filename: str, max_packets: int = 6):
+    """Debug frame decoding by driving a single codec context over the first packets."""
     print("\n=== DEBUGGING FRAME DECODING ===")
     
-    # Get a simple packet and try to decode it
-    frame_iterator = FileFrameIterator(filename)
+    # Open the container once and reuse its codec context for every packet,
+    # instead of going through a per-packet helper for each decode attempt
+    container = av.open(filename, mode='r')
+    video_stream = container.streams.video[0]
+    codec_context = video_stream.codec_context
+    codec_context.thread_type = "AUTO"
+    codec_context.thread_count = 0  # Let FFmpeg pick the number of threads
     
-    for packet_data in frame_iterator.iterator:
-        packet_no, packet = packet_data
-        print(f"Testing packet {packet_no}, size: {packet.size}")
-        
-        # Try different decoding approaches
-        print("  Trying decode_packet_to_frames:")
-        frames1 = decode_packet_to_frames(packet_data)
-        print(f"    Result: {len(frames1)} frames")
+    try:
+        total_frames = 0
+        lines = []
+        for packet_no, packet in enumerate(container.demux(video_stream)):
+            lines.append(f"Testing packet {packet_no}, size: {packet.size}")
+            
+            # decode() sends the packet and drains every frame the decoder has ready
+            try:
+                frames = codec_context.decode(packet)
+            except Exception as e:
+                lines.append(f"    Error decoding packet {packet_no}: {e}")
+                frames = []
+            lines.append(f"    Result: {len(frames)} frames")
+            total_frames += len(frames)
+            
+            # Only test first few packets
+            if packet_no + 1 >= max_packets:
+                break
+        _write_lines(lines)
         
-        print("  Trying decode_packet_to_frames_with_state:")
-        frames2, _ = decode_packet_to_frames_with_state(packet_data)
-        print(f"    Result: {len(frames2)} frames")
-        
-        print("  Trying decode_all_packets_with_flush:")
-        for p_no, p_frames in decode_all_packets_with_flush([packet_data]):
-            print(f"    Packet {p_no}: {len(p_frames)} frames")
+        # Flush the decoder to get the frames it is still holding
+        remaining_frames = flush_decoder(codec_context)
+        print(f"  Flushed: {len(remaining_frames)} frames")
+        total_frames += len(remaining_frames)
+        print(f"Decoded {total_frames} frames in total")
+    finally:
+        container.close()
+
+def _decode_gop_frame_count(filename: str, start_pts: int) -> int:
+    """Decode the GOP starting at the keyframe with start_pts in its own container, return its frame count."""
+    container = av.open(filename, mode='r')
+    try:
+        video_stream = container.streams.video[0]
+        container.seek(start_pts, any_frame=False, backward=True, stream=video_stream)
+        codec_context = video_stream.codec_context
         
-        # Only test first few packets
-        if packet_no >= 5:
-            break
+        frame_count = 0
+        for packet in container.demux(video_stream):
+            # The next keyframe starts the next GOP, which another worker decodes
+            if packet.is_keyframe and packet.pts != start_pts:
+                break
+            frame_count += len(codec_context.decode(packet))
+        frame_count += len(flush_decoder(codec_context))
+        return frame_count
+    finally:
+        container.close()
+
+def debug_gop_parallel_decoding(filename: str, max_workers: Optional[int] = None):
+    """Debug GOP-parallel decoding: split at keyframes and decode each GOP in a worker process."""
+    print("\n=== DEBUGGING GOP-PARALLEL DECODING ===")
+    
+    # Demux only (no decoder is set up) to find where each GOP starts
+    gop_start_pts = scan_keyframes(filename)
+    print(f"Found {len(gop_start_pts)} GOPs")
+    
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        frame_counts = list(executor.map(_decode_gop_frame_count, [filename] * len(gop_start_pts), gop_start_pts))
+    
+    _write_lines(f"  GOP {gop_index} (PTS {start_pts}): {frame_count} frames"
+                 for gop_index, (start_pts, frame_count) in enumerate(zip(gop_start_pts, frame_counts)))
+    print(f"Decoded {sum(frame_counts)} frames with {max_workers} workers")
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -105,4 +175,5 @@ if __name__ == "__main__":
     
     filename = sys.argv[1]
     debug_packet_filtering(filename)
-    debug_frame_decoding(filename) 
\ No newline at end of file
+    debug_frame_decoding(filename)
+    debug_gop_parallel_decoding(filename) 
\ No newline at end of file
@@ -1,18 +1,42 @@
 import av
+import cv2
+import logging
+import os
+from av.video.reformatter import VideoReformatter
+import matplotlib
+if os.environ.get("VIDUTILS_HEADLESS") == "1":
+    # Batch runs only save figures, so skip starting an interactive backend
+    matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-from typing import List, Iterator
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from typing import Callable, Dict, Iterable, List, Iterator, Optional, Sequence, Tuple
+from fractions import Fraction
+import heapq
 import math
+import numpy as np
 from vidfile_iterator import (
     FileFrameIterator,
     decode_all_packets_with_flush,
     packet_data_iterator_iterator,
     decode_packet_to_frames_with_state,
+    enable_threaded_decoding,
     frame_list_type,
 )
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 
-def reservoir_sample_frames(frame_iterator: Iterator, sample_size: int) -> List:
+logger = logging.getLogger(__name__)
+
+# Random generator for the "random" thumbnail sampling strategy
+_RNG = np.random.default_rng()
+
+
+def reservoir_sample_frames(frame_iterator: Iterator, sample_size: int,
+                            weight: Optional[Callable[[object], float]] = None) -> List:
     """
     Reservoir sampling for frames - maintains streaming model.
     Randomly samples N frames from a stream of frames.
@@ -20,40 +44,141 @@ def reservoir_sample_frames(frame_iterator: Iterator, sample_size: int) -> List:
     Args:
         frame_iterator: Iterator yielding frames
         sample_size: Number of frames to sample
+        weight: Optional function giving each frame a positive sampling weight
+            (e.g. favouring keyframes). None samples uniformly.
     
     Returns:
         List of randomly sampled frames (sorted by PTS)
     """
-    sampled_frames = []
-    frame_count = 0
+    if weight is not None:
+        return _weighted_reservoir_sample(frame_iterator, sample_size, weight)
     
-    for frame in frame_iterator:
-        frame_count += 1
-        
-        if len(sampled_frames) < sample_size:
-            # Fill the reservoir initially
-            sampled_frames.append(frame)
-        else:
-            # Randomly replace with probability sample_size/frame_count
-            if random.random() < sample_size / frame_count:
-                # Replace a random frame in the reservoir
-                replace_index = random.randint(0, sample_size - 1)
-                sampled_frames[replace_index] = frame
+    frame_iterator = iter(frame_iterator)
+    # Fill the reservoir initially
+    sampled_frames = list(islice(frame_iterator, sample_size))
+    
+    if sample_size > 0 and len(sampled_frames) == sample_size:
+        # Vitter's Algorithm L: draw how many frames to skip before the next one that
+        # enters the reservoir, instead of drawing a random number for every frame
+        w = math.exp(math.log(random.random()) / sample_size)
+        while True:
+            skip = math.floor(math.log(random.random()) / math.log(1.0 - w))
+            frame = next(islice(frame_iterator, skip, None), None)
+            if frame is None:
+                break
+            # Replace a random frame in the reservoir
+            sampled_frames[random.randrange(sample_size)] = frame
+            w *= math.exp(math.log(random.random()) / sample_size)
     
     # Sort by PTS to maintain temporal order in display
     sampled_frames.sort(key=lambda f: f.pts if f.pts is not None else 0)
     return sampled_frames
 
 
-def display_thumbnail_grid(all_thumbs: List[List], labels: List[str], thumbs_per_row: int = 10, title: str = "Thumbnails"):
+def _weighted_reservoir_sample(frame_iterator: Iterator, sample_size: int,
+                               weight: Callable[[object], float]) -> List:
+    """
+    Weighted reservoir sampling (Efraimidis-Spirakis A-Res).
+    Each frame gets the key -log(U) / weight and the sample_size smallest keys are kept,
+    in a heap whose root is the largest kept key, so a new frame costs O(log k) at most.
+    """
+    if sample_size <= 0:
+        return []
+    
+    heap = []  # (-key, index, frame); the index breaks ties so frames are never compared
+    for i, frame in enumerate(frame_iterator):
+        item = (math.log(random.random()) / weight(frame), i, frame)
+        if len(heap) < sample_size:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+    
+    sampled_frames = [frame for _, _, frame in heap]
+    sampled_frames.sort(key=lambda f: f.pts if f.pts is not None else 0)
+    return sampled_frames
+
+
+# Figures reused between calls that save to a file, keyed by (rows, cols)
+_FIGURE_CACHE: Dict[Tuple[int, int], Tuple[Figure, Axes]] = {}
+
+
+def grid_figure(rows: int, cols: int, output: Optional[str] = None) -> Tuple[Figure, Axes]:
+    """
+    Figure and single Axes for a rows x cols thumbnail grid.
+    A grid that is saved (output set) gets a figure kept outside pyplot, which is reused
+    by the next saved grid of the same shape: its labels are removed, and its image is
+    kept for show_mosaic to update in place. Shown figures belong to pyplot's windows,
+    so those are always new.
+    
+    Args:
+        rows: Number of thumbnail rows
+        cols: Number of thumbnails per row
+        output: Image path the grid will be saved to, or None if it will be shown
+    
+    Returns:
+        Tuple of (figure, axes)
+    """
+    if output is None:
+        return plt.subplots(figsize=(cols * 1.5, rows * 1.5))
+    cached = _FIGURE_CACHE.get((rows, cols))
+    if cached is not None:
+        for text in list(cached[1].texts):
+            text.remove()
+        return cached
+    fig = Figure(figsize=(cols * 1.5, rows * 1.5))
+    _FIGURE_CACHE[(rows, cols)] = fig, fig.add_subplot()
+    return _FIGURE_CACHE[(rows, cols)]
+
+
+def show_mosaic(ax: Axes, mosaic: np.ndarray, interpolation: Optional[str] = None):
+    """
+    Draw a tiled thumbnail image on ax. If ax already shows an image of the same shape
+    (a reused grid figure), its data is replaced with set_data() instead of adding a new
+    AxesImage, which skips rebuilding the image and its resampling setup.
+    """
+    if ax.images and ax.images[0].get_array().shape == mosaic.shape:
+        ax.images[0].set_data(mosaic)
+        return
+    for image in list(ax.images):
+        image.remove()
+    ax.imshow(mosaic, interpolation=interpolation)
+
+
+def show_or_save(fig, output: Optional[str] = None):
+    """
+    Show a finished figure, or save it to output and close it without opening a window.
+    
+    Args:
+        fig: Figure to show or save
+        output: Image path to write to, or None to show the figure interactively
+    """
+    if output is None:
+        plt.show()
+    else:
+        fig.savefig(output, dpi=100)
+        plt.close(fig)
+
+
+def tile_thumbnails(tiles: np.ndarray) -> np.ndarray:
+    """
+    Lay out a (rows, cols, H, W, 3) block of thumbnails as one (rows*H, cols*W, 3) image.
+    """
+    rows, cols, height, width, channels = tiles.shape
+    return tiles.transpose(0, 2, 1, 3, 4).reshape(rows * height, cols * width, channels)
+
+
+def display_thumbnail_grid(all_thumbs: List[List], labels: List[str], thumbs_per_row: int = 10, title: str = "Thumbnails",
+                           output: Optional[str] = None):
     """
     Display a grid of thumbnails using matplotlib.
     
     Args:
-        all_thumbs: List of thumbnail rows, where each row is a list of thumbnail arrays
+        all_thumbs: List of thumbnail rows, where each row is a list (or stacked array) of thumbnail arrays,
+            or a list of PNG bytes from encode_thumbnail
         labels: List of labels for each row
         thumbs_per_row: Maximum number of thumbnails per row
         title: Title for the plot
+        output: Save the grid to this image path instead of showing it
     """
     if not all_thumbs:
         print("No thumbnails to display")
@@ -61,7 +186,9 @@ def display_thumbnail_grid(all_thumbs: List[List], labels: List[str], thumbs_per
 
     # Flatten all thumbnail rows into a single sequence so that
     # ``thumbs_per_row`` truly controls the grid width.
-    flat_thumbs = [thumb for row in all_thumbs for thumb in row]
+    # PNG-encoded thumbnails (convert_frames_to_thumbnails(..., encode=True)) are decoded here
+    flat_thumbs = [decode_thumbnail(thumb) if isinstance(thumb, bytes) else thumb
+                   for row in all_thumbs for thumb in row]
     total = len(flat_thumbs)
     if total == 0:
         print("No thumbnails to display")
@@ -70,56 +197,141 @@ def display_thumbnail_grid(all_thumbs: List[List], labels: List[str], thumbs_per
     cols = max(1, thumbs_per_row)
     rows = math.ceil(total / cols)
 
-    fig, axes = plt.subplots(rows, cols, figsize=(cols * 1.5, rows * 1.5))
+    # Pad every thumbnail into a uniform cell and tile them into one image, so matplotlib
+    # draws a single Axes and a single imshow instead of one per cell
+    cell_h = max(thumb.shape[0] for thumb in flat_thumbs)
+    cell_w = max(thumb.shape[1] for thumb in flat_thumbs)
+    cells = np.full((rows * cols, cell_h, cell_w, 3), 255, dtype=np.uint8)  # Empty cells stay white
+    for idx, thumb in enumerate(flat_thumbs):
+        cells[idx, :thumb.shape[0], :thumb.shape[1]] = thumb
+    mosaic = tile_thumbnails(cells.reshape(rows, cols, cell_h, cell_w, 3))
+
+    fig, ax = grid_figure(rows, cols, output)
     fig.suptitle(title, fontsize=16)
+    show_mosaic(ax, mosaic, interpolation="nearest")
+    ax.axis("off")
+
+    # Label each input row at the cell where its first thumbnail landed
+    start = 0
+    for label, row in zip(labels, all_thumbs):
+        if len(row):
+            r, c = divmod(start, cols)
+            ax.text(c * cell_w + 2, r * cell_h + 2, label, fontsize=8, ha="left", va="top", color="white",
+                    bbox=dict(facecolor="black", alpha=0.5, edgecolor="none", pad=1), clip_on=True)
+        start += len(row)
+
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.9)
+    show_or_save(fig, output)
 
-    # Normalize axes indexing for rows==1 / cols==1 cases.
-    if rows == 1 and cols == 1:
-        axes_grid = [[axes]]
-    elif rows == 1:
-        axes_grid = [axes]
-    elif cols == 1:
-        axes_grid = [[ax] for ax in axes]
-    else:
-        axes_grid = axes
 
-    for idx in range(rows * cols):
-        r = idx // cols
-        c = idx % cols
-        ax = axes_grid[r][c]
-        ax.axis("off")
+def frame_to_thumbnail(frame, reformatter: VideoReformatter, downsample_factor: int = 4) -> np.ndarray:
+    """
+    Convert a frame to an RGB thumbnail array in one libswscale pass.
+    Area interpolation averages the source pixels, so the thumbnail doesn't alias
+    the way plain stride subsampling does.
+    
+    Args:
+        frame: Video frame to convert
+        reformatter: Reformatter to reuse between frames, so libswscale keeps its scaling context
+        downsample_factor: Factor to downsample the frame by
+    
+    Returns:
+        Thumbnail as an (H, W, 3) uint8 array
+    """
+    return reformatter.reformat(
+        frame,
+        width=max(1, frame.width // downsample_factor),
+        height=max(1, frame.height // downsample_factor),
+        format='rgb24',
+        interpolation='AREA',
+    ).to_ndarray()
+
+
+# Converts thumbnails in parallel: libswscale runs with the GIL released, so threads scale.
+# Created on first use; each worker thread keeps its own reformatter (and scaling context).
+_THUMBNAIL_POOL: Optional[ThreadPoolExecutor] = None
+_thumbnail_thread_state = threading.local()
+
+
+def _thumbnail_pool() -> ThreadPoolExecutor:
+    global _THUMBNAIL_POOL
+    if _THUMBNAIL_POOL is None:
+        _THUMBNAIL_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                             thread_name_prefix="thumbnails")
+    return _THUMBNAIL_POOL
+
+
+def encode_thumbnail(thumb: np.ndarray) -> bytes:
+    """Compress an RGB thumbnail to PNG bytes."""
+    ok, buf = cv2.imencode('.png', cv2.cvtColor(thumb, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_PNG_COMPRESSION, 3])
+    if not ok:
+        raise ValueError("PNG encoding failed")
+    return buf.tobytes()
 
-        if idx < total:
-            ax.imshow(flat_thumbs[idx])
 
-    plt.tight_layout()
-    plt.subplots_adjust(top=0.9)
-    plt.show()
+def decode_thumbnail(data: bytes) -> np.ndarray:
+    """Inverse of encode_thumbnail: PNG bytes back to an (H, W, 3) RGB array."""
+    return cv2.cvtColor(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
 
 
-def convert_frames_to_thumbnails(frames: List, downsample_factor: int = 4) -> List:
+def _frame_to_thumb(frame, downsample_factor: int, encode: bool = False):
     """
-    Convert a list of frames to thumbnail arrays.
+    frame_to_thumbnail with this thread's reformatter, PNG-encoded if encode is set.
+    None (after printing the error) if conversion fails.
+    """
+    reformatter = getattr(_thumbnail_thread_state, "reformatter", None)
+    if reformatter is None:
+        reformatter = _thumbnail_thread_state.reformatter = VideoReformatter()
+    try:
+        thumb = frame_to_thumbnail(frame, reformatter, downsample_factor)
+        return encode_thumbnail(thumb) if encode else thumb
+    except Exception as e:
+        logger.warning("Error processing frame: %s", e)
+        return None
+
+
+def convert_frames_to_thumbnails(frames: List, downsample_factor: int = 4, encode: bool = False):
+    """
+    Convert a list of frames to thumbnails, stacked in one contiguous array.
+    Frames of a group share their dimensions, so every thumbnail has the size of the first one.
+    Frames are converted on a shared thread pool; the output keeps their order.
     
     Args:
         frames: List of video frames to convert
         downsample_factor: Factor to downsample thumbnails (default: 4)
+        encode: Return PNG bytes per thumbnail instead, which hold much less memory
+            when thumbnails are kept around or sent elsewhere (see decode_thumbnail)
     
     Returns:
-        List of thumbnail arrays (numpy arrays)
+        (N, H, W, 3) uint8 array of thumbnails, one per converted frame,
+        or a list of PNG bytes if encode is set
     """
-    thumbs = []
-    for frame in frames:
-        try:
-            # Convert frame to RGB and resize
-            rgb_frame = frame.to_ndarray(format='rgb24')
-            # Resize to thumbnail size using downsampling
-            thumb = rgb_frame[::downsample_factor, ::downsample_factor]
-            thumbs.append(thumb)
-        except Exception as e:
-            print(f"Error processing frame: {e}")
+    if not frames:
+        return [] if encode else np.empty((0, 0, 0, 3), dtype=np.uint8)
+    
+    if len(frames) == 1:
+        results = [_frame_to_thumb(frames[0], downsample_factor, encode)]
+    else:
+        count = len(frames)
+        results = _thumbnail_pool().map(_frame_to_thumb, frames, [downsample_factor] * count, [encode] * count)
+    
+    if encode:
+        return [data for data in results if data is not None]
+    
+    thumbs = None
+    write_idx = 0
+    for thumb in results:
+        if thumb is None:
             continue
-    return thumbs
+        if thumbs is None:
+            # Sized from the first thumbnail; only trimmed if some frames fail to convert
+            thumbs = np.empty((len(frames),) + thumb.shape, dtype=np.uint8)
+        thumbs[write_idx] = thumb
+        write_idx += 1
+    if thumbs is None:
+        return np.empty((0, 0, 0, 3), dtype=np.uint8)
+    return thumbs[:write_idx]
 
 
 def process_frame_group_for_display(frames: List, chunk: List, group_index: int, sampling_strategy: str, thumbs_per_row: int):
@@ -134,28 +346,27 @@ def process_frame_group_for_display(frames: List, chunk: List, group_index: int,
         thumbs_per_row: Maximum thumbnails per row
     
     Returns:
-        Tuple of (thumbnails_list, label_string) or (None, None) if no thumbnails
+        Tuple of (thumbnail_array, label_string) or (None, None) if no thumbnails
     """
     # Convert frames to thumbnails
     thumbs = convert_frames_to_thumbnails(chunk)
     
-    if not thumbs:
+    if not len(thumbs):
         return None, None
     
-    # Extract PTS and timecode information from the complete group
-    first_frame = frames[0]
-    last_frame = frames[-1]
-    first_pts = first_frame.pts if first_frame.pts is not None else 0
-    last_pts = last_frame.pts if last_frame.pts is not None else 0
-    
-    # Convert PTS to timecode if possible
-    try:
-        time_base = first_frame.time_base
-        first_time = first_pts * time_base if time_base else 0
-        last_time = last_pts * time_base if time_base else 0
-        timecode_str = f" ({first_time:.3f}s-{last_time:.3f}s)"
-    except:
+    # Extract PTS and timecode information from the complete group.
+    # Each frame attribute read goes through PyAV, so read them once.
+    first_pts = frames[0].pts
+    last_pts = frames[-1].pts
+    first_pts = first_pts if first_pts is not None else 0
+    last_pts = last_pts if last_pts is not None else 0
+
+    # Convert PTS to timecode if the frames carry a time base
+    time_base = frames[0].time_base
+    if time_base is None:
         timecode_str = ""
+    else:
+        timecode_str = f" ({float(first_pts * time_base):.3f}s-{float(last_pts * time_base):.3f}s)"
     
     # Create sampling strategy description for the label
     if sampling_strategy == "bookend" and len(frames) > thumbs_per_row:
@@ -172,15 +383,17 @@ def process_frame_group_for_display(frames: List, chunk: List, group_index: int,
 
 
 def display_thumbnails_from_frames(
-    frame_groups: List[frame_list_type], 
+    frame_groups: Iterable[frame_list_type], 
     thumbs_per_row: int = 10, 
     sampling_strategy: str = "first"):
     """
     Display thumbnails from a list of frame groups.
     Each group is a list of frames that were decoded together.
+    Pass a generator (e.g. group_packets_by_pts_and_decode_streaming) to decode lazily:
+    groups after the last displayed row are then never pulled, so never decoded.
     
     Args:
-        frame_groups: List of frame lists, where each inner list contains frames from one group
+        frame_groups: Iterable of frame lists, where each inner list contains frames from one group
         thumbs_per_row: Maximum number of thumbnails per row
         sampling_strategy: "first" for first N frames, "bookend" for first N/2 + last N/2 frames, "random" for random N frames
     """
@@ -189,12 +402,8 @@ def display_thumbnails_from_frames(
     labels = []
 
     for group_index, frames in enumerate(frame_groups):
-        if len(all_thumbs) >= 4:  # Stop after 4 rows
-            print(f"Reached maximum rows ({len(all_thumbs)}), stopping.")
-            break
-        
         if not frames:
-            print(f"Group {group_index}: No frames, skipping.")
+            logger.debug("Group %d: No frames, skipping.", group_index)
             continue
         
         # Select frames based on sampling strategy
@@ -203,8 +412,10 @@ def display_thumbnails_from_frames(
             half = thumbs_per_row // 2
             chunk = frames[:half] + frames[-half:]
         elif sampling_strategy == "random" and len(frames) > thumbs_per_row:
-            # Use reservoir sampling for true streaming random sampling
-            chunk = reservoir_sample_frames(iter(frames), thumbs_per_row)
+            # The group is already a list of known length, so draw all the indices in one call
+            # (reservoir_sample_frames is for streams); sorted indices keep presentation order
+            indices = np.sort(_RNG.choice(len(frames), size=thumbs_per_row, replace=False))
+            chunk = [frames[i] for i in indices]
         else:
             # Take first N frames (default behavior)
             chunk = frames[:thumbs_per_row]
@@ -212,9 +423,14 @@ def display_thumbnails_from_frames(
         # Process the frame group for display (convert to thumbnails and create label)
         thumbs, label = process_frame_group_for_display(frames, chunk, group_index, sampling_strategy, thumbs_per_row)
         
-        if thumbs and label:
+        if label:
             all_thumbs.append(thumbs)
             labels.append(label)
+        
+        # Check right after adding a row, so the next group isn't pulled from frame_groups
+        if len(all_thumbs) >= 4:  # Stop after 4 rows
+            logger.debug("Reached maximum rows (%d), stopping.", len(all_thumbs))
+            break
     
     # Display thumbnails using the extracted function
     title = f"Thumbnails ({sampling_strategy.capitalize()} Sampling)"
@@ -302,3 +518,55 @@ def display_frame_window_around_index(
     thumbs = convert_frames_to_thumbnails(window)
     title = f"Frames {center_index - k}..{center_index + k} around {center_index}"
     display_thumbnail_grid([thumbs], labels=[title], thumbs_per_row=per_row, title=title)
+
+
+def display_thumbnails_seek(container, stream, timestamps: Sequence[float], thumbs_per_row: int = 10, title: str = "Thumbnails",
+                            downsample_factor: int = 4, output: Optional[str] = None, keyframes_only: bool = False):
+    """
+    Show one thumbnail per target timestamp by seeking to it, instead of scanning the
+    stream packet by packet. The work scales with the number of timestamps, not with
+    the length of the video.
+
+    Args:
+        container: Open input container
+        stream: Video stream of the container to take thumbnails from
+        timestamps: Target times in seconds
+        thumbs_per_row: Number of thumbnails per grid row
+        title: Title for the plot
+        downsample_factor: Factor to shrink each frame by when converting it to a thumbnail
+        output: Save the grid to this image path instead of showing it
+        keyframes_only: Use the keyframe at or before each timestamp instead of decoding
+            forward to the exact frame. The decoder then skips every non-keyframe, and
+            timestamps that fall in the same GOP give a single thumbnail.
+    """
+    time_base = stream.time_base if stream.time_base else Fraction(1, 25)
+    codec_context = stream.codec_context
+    enable_threaded_decoding(codec_context)
+    reformatter = VideoReformatter()  # Reused so libswscale keeps its scaling context
+    skip_frame = codec_context.skip_frame
+    if keyframes_only:
+        codec_context.skip_frame = "NONKEY"
+
+    thumbs = []
+    times = []
+    last_pts = None
+    try:
+        for t in timestamps:
+            # Seek to the keyframe at or before t, then decode forward to the first frame at t
+            container.seek(int(t / time_base), stream=stream, backward=True)
+            for frame in container.decode(stream):
+                if frame.pts is None or (not keyframes_only and frame.pts * time_base < t):
+                    continue
+                if frame.pts != last_pts:
+                    thumbs.append(frame_to_thumbnail(frame, reformatter, downsample_factor))
+                    times.append(float(frame.pts * time_base))
+                    last_pts = frame.pts
+                break
+    finally:
+        codec_context.skip_frame = skip_frame
+
+    # display_thumbnail_grid takes one label per row, so label each row with its time span
+    rows = [thumbs[i:i + thumbs_per_row] for i in range(0, len(thumbs), thumbs_per_row)]
+    labels = [f"{times[i]:.2f}s-{times[min(i + thumbs_per_row, len(times)) - 1]:.2f}s"
+              for i in range(0, len(times), thumbs_per_row)]
+    display_thumbnail_grid(rows, labels, thumbs_per_row, title, output)
@@ -82,22 +82,19 @@ def show_normalization_logic():
     print("""
 def normalize_input(stream):
     try:
-        first_item = next(iter(stream))
-        
-        # If first_item looks like packet_data (tuple with int first element)
-        if isinstance(first_item, tuple) and len(first_item) == 2 and isinstance(first_item[0], int):
-            return [stream]  # Wrap single iterator in list
-        else:
-            # Already an iterator of iterators, reconstruct
-            def reconstruct():
-                yield first_item
-                yield from stream
-            return reconstruct()
-            
-    except StopIteration:
-        return []  # Empty stream
+        stream = iter(stream)
     except TypeError:
         return [stream]  # Not iterable, treat as single iterator
+    
+    first_item = next(stream, None)
+    if first_item is None:
+        return []  # Empty stream
+    rebuilt = chain([first_item], stream)  # Put the peeked item back in front
+    
+    # If first_item looks like packet_data (tuple with int first element)
+    if isinstance(first_item, tuple) and len(first_item) == 2 and isinstance(first_item[0], int):
+        return [rebuilt]  # Wrap single iterator in list
+    return rebuilt  # Already an iterator of iterators
 
 # Then simply process each stream:
 normalized_streams = normalize_input(packet_stream)
@@ -7,6 +7,7 @@ from vidfile_iterator import (
     FileFrameIterator, 
     filter_stream_preserve_consecutivity, 
     filter_small_packets,
+    make_size_filter,
     decode_packet_to_frames,
     decode_all_packets_with_flush
 )
@@ -26,7 +27,7 @@ def process_consecutive_packets_efficiently(filename: str, max_packet_size: int
     # Filter packets while preserving consecutivity
     filtered_streams = filter_stream_preserve_consecutivity(
         file_iterator.iterator, 
-        lambda p: filter_small_packets(p, max_packet_size)
+        make_size_filter(max_size=max_packet_size)
     )
     
     total_consecutive_groups = 0
@@ -37,25 +38,34 @@ def process_consecutive_packets_efficiently(filename: str, max_packet_size: int
         print(f"\nProcessing Consecutive Group {group_idx + 1}:")
         print("-" * 40)
         
-        group_packets = list(consecutive_packets)  # Convert to list for processing
-        packet_numbers = [p[0] for p in group_packets]
-        
-        print(f"  Packet numbers: {packet_numbers}")
-        print(f"  Group size: {len(group_packets)} packets")
-        
-        # Process this consecutive group efficiently
-        # You can use decode_all_packets_with_flush for optimal processing
-        for packet_no, packet in group_packets:
-            frames = decode_packet_to_frames((packet_no, packet))
+        # Process this consecutive group efficiently: one codec context decodes the
+        # whole group, keeping its reference frames, and is flushed once at the end.
+        # Packets are streamed from the group rather than collected into a list first.
+        packet_numbers = []
+        for packet_no, frames in decode_all_packets_with_flush(consecutive_packets):
+            if packet_no == -1:
+                print(f"    Flush: decoded {len(frames)} frames")
+                continue
+            packet_numbers.append(packet_no)
             print(f"    Packet {packet_no}: decoded {len(frames)} frames")
             total_packets_processed += 1
         
+        print(f"  Packet numbers: {packet_numbers}")
+        print(f"  Group size: {len(packet_numbers)} packets")
+        
         total_consecutive_groups += 1
     
     print(f"\nSummary:")
     print(f"  Total consecutive groups: {total_consecutive_groups}")
     print(f"  Total packets processed: {total_packets_processed}")
 
+def _size_range_filter(min_size: int, max_size: int):
+    """
+    Build a filter keeping packets with min_size <= size <= max_size.
+    The bounds are bound into the closure once, so each call is one comparison chain.
+    """
+    return lambda packet_data: min_size <= packet_data[1].size <= max_size
+
 def create_custom_filter_example():
     """
     Example: Create custom filters for different use cases.
@@ -64,20 +74,17 @@ def create_custom_filter_example():
     print("Custom Filter Examples:")
     print("=" * 60)
     
+    # Filters run once per packet, so each is a single expression over the
+    # (packet_no, packet) tuple, without unpacking it or calling helpers
+    
     # Example 1: Filter packets by even packet numbers
-    def even_packet_filter(packet_data):
-        packet_no, packet = packet_data
-        return packet_no % 2 == 0
+    even_packet_filter = lambda packet_data: packet_data[0] % 2 == 0
     
     # Example 2: Filter packets by size range
-    def size_range_filter(packet_data, min_size=500, max_size=2000):
-        packet_no, packet = packet_data
-        return min_size <= packet.size <= max_size
+    size_range_filter = _size_range_filter(500, 2000)
     
     # Example 3: Filter packets by position in stream (first 100 packets)
-    def first_100_filter(packet_data):
-        packet_no, packet = packet_data
-        return packet_no < 100
+    first_100_filter = lambda packet_data: packet_data[0] < 100
     
     print("Available custom filters:")
     print("1. even_packet_filter: Keep only even-numbered packets")
@@ -1,103 +1,122 @@
 import sys
+from fractions import Fraction
+from functools import lru_cache
 from vidfile_iterator import FileFrameIterator
 import av
 import av.container, av.packet, av.stream
 
+# Data attributes worth showing for a packet. Listing them up front avoids walking
+# dir(packet) and testing callable() on every attribute of every analyzed packet.
+_PACKET_ATTRS = ('pts', 'dts', 'duration', 'time_base', 'size', 'stream_index', 'flags', 'is_keyframe',
+                 'is_corrupt', 'is_discard', 'is_disposable', 'pos', 'side_data')
+
+# Frame-related methods depend only on the Packet type, so look them up once
+_PACKET_FRAME_METHODS = [attr for attr in dir(av.packet.Packet)
+                         if 'frame' in attr.lower() and callable(getattr(av.packet.Packet, attr))]
+
 def explore_packet_fields(packet_data, actual_fps=None):
     """
     Explore and display all available fields in an av.packet.Packet object.
     """
     packet_no, packet = packet_data
+    # Output is collected here and written once at the end, not one print() per line
+    lines = []
     
-    print(f"\n=== Packet {packet_no} Analysis ===")
-    print(f"Packet type: {type(packet)}")
-    print(f"Packet size: {packet.size}")
+    lines.append(f"\n=== Packet {packet_no} Analysis ===")
+    lines.append(f"Packet type: {type(packet)}")
+    lines.append(f"Packet size: {packet.size}")
     
-    # Get all attributes of the packet
-    print("\n--- All Packet Attributes ---")
-    for attr in dir(packet):
-        if not attr.startswith('_'):  # Skip private attributes
-            try:
-                value = getattr(packet, attr)
-                if not callable(value):  # Skip methods, only show properties
-                    print(f"  {attr}: {value}")
-            except Exception as e:
-                print(f"  {attr}: Error accessing - {e}")
+    # Show the packet's data attributes
+    lines.append("\n--- Packet Attributes ---")
+    for attr in _PACKET_ATTRS:
+        lines.append(f"  {attr}: {getattr(packet, attr, None)}")
     
     # Check for specific frame-related attributes
-    print("\n--- Frame-Related Attributes ---")
+    lines.append("\n--- Frame-Related Attributes ---")
     frame_attrs = ['pts', 'dts', 'duration', 'time_base', 'stream_index', 'flags', 'side_data']
     for attr in frame_attrs:
         try:
             value = getattr(packet, attr, None)
             if value is not None:
-                print(f"  {attr}: {value}")
+                lines.append(f"  {attr}: {value}")
         except Exception as e:
-            print(f"  {attr}: Error - {e}")
+            lines.append(f"  {attr}: Error - {e}")
     
     # Test frame estimation with actual FPS
-    print("\n--- Frame Estimation Test ---")
+    lines.append("\n--- Frame Estimation Test ---")
     if actual_fps:
-        estimated_frames = estimate_frames_in_packet(packet, actual_fps)
+        estimated_frames = estimate_frames_in_packet(packet, actual_fps, debug=True, lines=lines)
         if estimated_frames>1:
-            print(" ***** More than 1 frame in packet *****")
-        print(f"  Estimated frames in packet (using actual FPS {actual_fps}): {estimated_frames}")
+            lines.append(" ***** More than 1 frame in packet *****")
+        lines.append(f"  Estimated frames in packet (using actual FPS {actual_fps}): {estimated_frames}")
     else:
-        estimated_frames = estimate_frames_in_packet(packet)
-        print(f"  Estimated frames in packet (using default 30 FPS): {estimated_frames}")
+        estimated_frames = estimate_frames_in_packet(packet, debug=True, lines=lines)
+        lines.append(f"  Estimated frames in packet (using default 30 FPS): {estimated_frames}")
     
     # Check if packet has any frame count information
-    print("\n--- Frame Count Investigation ---")
+    lines.append("\n--- Frame Count Investigation ---")
     try:
         # Some packets might have frame count in side_data
         if hasattr(packet, 'side_data') and packet.side_data:
-            print(f"  Side data available: {len(packet.side_data)} items")
+            lines.append(f"  Side data available: {len(packet.side_data)} items")
             for i, data in enumerate(packet.side_data):
-                print(f"    Side data {i}: {data}")
+                lines.append(f"    Side data {i}: {data}")
         
         # Check if there are any methods that might give frame info
-        frame_methods = [attr for attr in dir(packet) if 'frame' in attr.lower() and callable(getattr(packet, attr))]
-        if frame_methods:
-            print(f"  Frame-related methods: {frame_methods}")
+        if _PACKET_FRAME_METHODS:
+            lines.append(f"  Frame-related methods: {_PACKET_FRAME_METHODS}")
             
     except Exception as e:
-        print(f"  Error checking frame info: {e}")
+        lines.append(f"  Error checking frame info: {e}")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
+
+@lru_cache(maxsize=None)
+def _time_base_to_float(time_base: Fraction) -> float:
+    """float() of a stream time base; a stream has one time base, so this is computed once per stream."""
+    return float(time_base)
 
-def estimate_frames_in_packet(packet, fps=30.0):
-    """Estimate frame count using packet duration and time_base"""
-    if packet.duration and packet.time_base:
+def estimate_frames_in_packet(packet, fps=30.0, debug=False, lines=None):
+    """
+    Estimate frame count using packet duration and time_base. Set debug to print the intermediate
+    values, or to append them to lines when a list is given.
+    """
+    out = lines.append if lines is not None else print
+    duration = packet.duration
+    time_base = packet.time_base
+    if duration and time_base:
         # Convert time_base to float for calculation
-        time_base_float = float(packet.time_base)
-        duration_seconds = packet.duration * time_base_float
+        time_base_float = _time_base_to_float(time_base)
+        duration_seconds = duration * time_base_float
         estimated_frames = duration_seconds * fps
         
-        # Debug output
-        print(f"  DEBUG: packet.duration = {packet.duration}")
-        print(f"  DEBUG: packet.time_base = {packet.time_base} (type: {type(packet.time_base)})")
-        print(f"  DEBUG: time_base_float = {time_base_float}")
-        print(f"  DEBUG: duration_seconds = {duration_seconds}")
-        print(f"  DEBUG: fps = {fps}")
-        print(f"  DEBUG: estimated_frames = {estimated_frames}")
-        print(f"  DEBUG: rounded_frames = {round(estimated_frames)}")
+        if debug:
+            out(f"  DEBUG: packet.duration = {duration}")
+            out(f"  DEBUG: packet.time_base = {time_base} (type: {type(time_base)})")
+            out(f"  DEBUG: time_base_float = {time_base_float}")
+            out(f"  DEBUG: duration_seconds = {duration_seconds}")
+            out(f"  DEBUG: fps = {fps}")
+            out(f"  DEBUG: estimated_frames = {estimated_frames}")
+            out(f"  DEBUG: rounded_frames = {round(estimated_frames)}")
         
         return round(estimated_frames)
-    else:
-        print(f"  DEBUG: Missing duration or time_base")
-        print(f"  DEBUG: packet.duration = {packet.duration}")
-        print(f"  DEBUG: packet.time_base = {packet.time_base}")
+    elif debug:
+        out(f"  DEBUG: Missing duration or time_base")
+        out(f"  DEBUG: packet.duration = {duration}")
+        out(f"  DEBUG: packet.time_base = {time_base}")
     return None
 
+# AV_PKT_FLAG_* bits and their labels
+_FLAG_TABLE = ((0x0001, "Keyframe"), (0x0002, "Corrupt"), (0x0004, "Discard"))
+# The same flags as exposed by PyAV versions that don't have Packet.flags
+_FLAG_PROPERTY_TABLE = (("is_keyframe", "Keyframe"), ("is_corrupt", "Corrupt"), ("is_discard", "Discard"))
+
 def analyze_packet_flags(packet):
     """Analyze packet flags for frame-related hints"""
-    flags = []
-    if hasattr(packet, 'flags'):
-        if packet.flags & 0x0001:  # AV_PKT_FLAG_KEY
-            flags.append("Keyframe")
-        if packet.flags & 0x0002:  # AV_PKT_FLAG_CORRUPT
-            flags.append("Corrupt")
-        if packet.flags & 0x0004:  # AV_PKT_FLAG_DISCARD
-            flags.append("Discard")
-    return flags
+    packet_flags = getattr(packet, 'flags', None)
+    if packet_flags is not None:
+        return [name for mask, name in _FLAG_TABLE if packet_flags & mask]
+    return [name for attr, name in _FLAG_PROPERTY_TABLE if getattr(packet, attr, False)]
 
 def main():
     if len(sys.argv) < 2:
@@ -1,3 +1,4 @@
+import os
 import sys
 from display_utils import display_thumbnails_from_frames
 from vidfile_iterator import *
@@ -14,51 +15,74 @@ def main():
     filename = sys.argv[1]
     print(f"Analyzing: {filename}")
     
-    # Create the frame iterator
-    frame_iterator = FileFrameIterator(filename)
+    # Create the frame iterator. Filtering and grouping only need packet numbers, sizes and
+    # PTS (groups are re-decoded from the file by PTS range), so keep just that metadata
+    # and let each packet's payload be released as soon as it is demuxed.
+    frame_iterator = FileFrameIterator(filename, metadata_only=True)
     
     # Apply multiple filters in a chain
     print("Testing filter chaining approach:")
     print("Note: Using streaming approach that doesn't store packets in memory")
     
-    # Example 1: Size-based filtering (small packets between 500-10000 bytes)
-    filtered_stream_1 = chain_filters(
+    # The conditions are evaluated with numpy over batches of packets (prefilter_packets)
+    # rather than by a chain of per-packet Python filter functions
+    # Example 1: Size-based filtering (non-empty packets smaller than 1000 bytes)
+    filtered_stream_1 = prefilter_packets(
         frame_iterator.iterator,
-        lambda x: filter_small_packets(x, 1000),  # Max 10KB
-        lambda x: filter_large_packets(x, 0)     # Min 500B
+        min_size=0,     # Larger than 0B
+        max_size=1000,  # Smaller than 1000B
     )
     
     # Example 2: Size + PTS range filtering
-    filtered_stream_2 = chain_filters(
+    filtered_stream_2 = prefilter_packets(
         frame_iterator.iterator,
-        lambda x: filter_small_packets(x, 200),   # Max 8KB
-        lambda x: filter_by_pts_range(x, 1000, 20000)  # PTS between 1000-20000
+        max_size=200,             # Smaller than 200B
+        pts_range=(1000, 20000),  # PTS between 1000-20000
     )
     
     # Use the first filter chain for demonstration with streaming approach
     print("Using streaming approach (no memory storage of packets)...")
-    frame_groups = list(group_packets_by_pts_and_decode_streaming(filename, filtered_stream_1, lambda x: True))  # No additional filtering needed
+    # Groups are decoded in parallel, one worker per core, on a background thread that
+    # stays a few groups ahead: the bookend display below converts group N to thumbnails
+    # while later groups are still decoding, instead of waiting for every group first
+    decoded_groups = iterate_in_background(
+        group_packets_by_pts_and_decode_streaming(filename, filtered_stream_1, None,  # No additional filtering needed
+                                                  max_workers=os.cpu_count() or 1),
+        maxsize=4)
+    
+    # Groups are kept as they arrive, since the random sampling display shows them again
+    frame_groups = []
+    
+    def received_groups():
+        for frames in decoded_groups:
+            i = len(frame_groups)
+            frame_groups.append(frames)
+            if i <= 10:  # Limit output
+                print(f"Group {i}: {len(frames)} frames")
+                if frames:
+                    print(f"  Frame PTS values: {[frame.pts for frame in frames[:5]]}...")  # Show first 5 frame PTS
+            elif i == 11:
+                print("... (more groups omitted)")
+            yield frames
     
     print(f"\n=== DETAILED FRAME GROUP ANALYSIS ===")
-    print(f"Total frame groups: {len(frame_groups)}")
-    for i, frames in enumerate(frame_groups):
-        print(f"Group {i}: {len(frames)} frames")
-        if frames:
-            print(f"  Frame PTS values: {[frame.pts for frame in frames[:5]]}...")  # Show first 5 frame PTS
-        if i >= 10:  # Limit output
-            print("... (more groups omitted)")
-            break
+    groups = received_groups()
     
     # Display thumbnails from the frame groups
+    # from display_utils import display_thumbnails_from_frames
+    
+    # print("\n=== Testing First 10 Frames Sampling ===")
+    # display_thumbnails_from_frames(frame_groups, sampling_strategy="first")
+    
+    print("\n=== Testing Bookend Sampling (First 5 + Last 5) ===")
+    display_thumbnails_from_frames(groups, sampling_strategy="bookend")
+    
+    # The display stops after its last row; receive the remaining groups too
+    for _ in groups:
+        pass
+    print(f"Total frame groups: {len(frame_groups)}")
+    
     if frame_groups:
-        # from display_utils import display_thumbnails_from_frames
-        
-        # print("\n=== Testing First 10 Frames Sampling ===")
-        # display_thumbnails_from_frames(frame_groups, sampling_strategy="first")
-        
-        print("\n=== Testing Bookend Sampling (First 5 + Last 5) ===")
-        display_thumbnails_from_frames(frame_groups, sampling_strategy="bookend")
-        
         print("\n=== Testing Random Sampling (10 random frames) ===")
         display_thumbnails_from_frames(frame_groups, sampling_strategy="random")
     else:
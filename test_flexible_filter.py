@@ -7,38 +7,39 @@ single iterators and iterator of iterators.
 from vidfile_iterator import filter_stream_preserve_consecutivity, packet_data_type
 from typing import Iterator, List
 
+class MockStream:
+    """Stand-in for av.stream.Stream; the filters never decode, so there is no codec context."""
+    __slots__ = ('codec_context',)
+
+    def __init__(self):
+        self.codec_context = None
+
+# One stream shared by every mock packet, as all packets of a real stream share theirs
+_SHARED_STREAM = MockStream()
+
+class MockPacket:
+    """Stand-in for av.packet.Packet with just the fields the filters read."""
+    __slots__ = ('size', 'stream')
+
+    def __init__(self, size: int, stream: MockStream = _SHARED_STREAM):
+        self.size = size
+        self.stream = stream
+
+def _mock_stream(packet_numbers: List[int]) -> Iterator[packet_data_type]:
+    """Mock packet stream with the given packet numbers; packet n has size n * 100."""
+    for packet_no in packet_numbers:
+        yield (packet_no, MockPacket(packet_no * 100))
+
 def create_test_packet_stream() -> Iterator[packet_data_type]:
     """Create a test packet stream with some gaps."""
-    packet_numbers = [0, 1, 2, 5, 6, 7, 10, 11, 12, 13, 15, 16, 17, 18, 20]
-    
-    for packet_no in packet_numbers:
-        mock_packet = type('MockPacket', (), {
-            'size': packet_no * 100,
-            'stream': type('MockStream', (), {'codec_context': None})()
-        })()
-        yield (packet_no, mock_packet)
+    return _mock_stream([0, 1, 2, 5, 6, 7, 10, 11, 12, 13, 15, 16, 17, 18, 20])
 
 def create_multiple_test_streams() -> List[Iterator[packet_data_type]]:
     """Create multiple test packet streams."""
-    def stream1():
-        packet_numbers = [0, 1, 2, 5, 6, 7]
-        for packet_no in packet_numbers:
-            mock_packet = type('MockPacket', (), {
-                'size': packet_no * 100,
-                'stream': type('MockStream', (), {'codec_context': None})()
-            })()
-            yield (packet_no, mock_packet)
-    
-    def stream2():
-        packet_numbers = [10, 11, 12, 13, 15, 16, 17, 18, 20]
-        for packet_no in packet_numbers:
-            mock_packet = type('MockPacket', (), {
-                'size': packet_no * 100,
-                'stream': type('MockStream', (), {'codec_context': None})()
-            })()
-            yield (packet_no, mock_packet)
-    
-    return [stream1(), stream2()]
+    return [
+        _mock_stream([0, 1, 2, 5, 6, 7]),
+        _mock_stream([10, 11, 12, 13, 15, 16, 17, 18, 20]),
+    ]
 
 def test_single_iterator():
     """Test with a single packet iterator."""
@@ -1,5 +1,5 @@
 import sys
-from vidfile_iterator import FileFrameIterator, decode_all_packets_with_flush, filter_small_packets
+from vidfile_iterator import FileFrameIterator, decode_all_packets_with_flush, make_size_filter
 import av
 
 def test_proper_decoding_with_flush():
@@ -16,7 +16,7 @@ def test_proper_decoding_with_flush():
     
     # Apply filter to only get packets smaller than 50000 bytes
     max_packet_size = 50000
-    filtered_iterator = filter(lambda x: filter_small_packets(x, max_packet_size), frame_iterator.iterator)
+    filtered_iterator = filter(make_size_filter(max_size=max_packet_size), frame_iterator.iterator)
     
     print(f"Filtering packets smaller than {max_packet_size} bytes...")
     
@@ -25,20 +25,20 @@ def test_proper_decoding_with_flush():
     packet_count = 0
     max_packets_to_test = 10  # Limit for testing
     
+    lines = []  # Collected and written once after the loop, not one print() per frame
     for packet_no, frames in decode_all_packets_with_flush(filtered_iterator, max_packets_to_test):
         if packet_no == -1:
             # These are flushed frames
-            print(f"\n=== FLUSHED FRAMES ===")
-            for i, frame in enumerate(frames):
-                print(f"  Flushed frame {i}: PTS={frame.pts}")
+            lines.append(f"\n=== FLUSHED FRAMES ===")
+            lines.extend(f"  Flushed frame {i}: PTS={frame.pts}" for i, frame in enumerate(frames))
             total_frames += len(frames)
         else:
             # These are regular packet frames
-            print(f"\n  Packet {packet_no}: {len(frames)} frames")
-            for i, frame in enumerate(frames):
-                print(f"    Frame {i}: PTS={frame.pts}")
+            lines.append(f"\n  Packet {packet_no}: {len(frames)} frames")
+            lines.extend(f"    Frame {i}: PTS={frame.pts}" for i, frame in enumerate(frames))
             total_frames += len(frames)
             packet_count += 1
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print(f"\n=== SUMMARY ===")
     print(f"Processed {packet_count} packets")
@@ -12,6 +12,7 @@ from vidfile_iterator import (
     packet_data_type
 )
 from typing import Iterator
+import sys
 
 def test_individual_packet_decoding(filename: str, max_packets: int = 10):
     """
@@ -23,6 +24,7 @@ def test_individual_packet_decoding(filename: str, max_packets: int = 10):
     file_iterator = FileFrameIterator(filename)
     packet_count = 0
     total_frames = 0
+    lines = []  # Written once after the loop, not one print() per packet
     
     for packet_data in file_iterator.iterator:
         if packet_count >= max_packets:
@@ -31,10 +33,11 @@ def test_individual_packet_decoding(filename: str, max_packets: int = 10):
         packet_no, packet = packet_data
         frames = decode_packet_to_frames(packet_data)
         
-        print(f"Packet {packet_no}: {len(frames)} frames")
+        lines.append(f"Packet {packet_no}: {len(frames)} frames")
         total_frames += len(frames)
         packet_count += 1
     
+    sys.stdout.write("\n".join(lines) + "\n")
     print(f"\nTotal: {packet_count} packets, {total_frames} frames")
     print(f"Average frames per packet: {total_frames/packet_count:.2f}")
 
@@ -48,6 +51,7 @@ def test_individual_packet_decoding_with_state(filename: str, max_packets: int =
     file_iterator = FileFrameIterator(filename)
     packet_count = 0
     total_frames = 0
+    lines = []  # Written once after the loop, not one print() per packet
     codec_context = None
     
     for packet_data in file_iterator.iterator:
@@ -57,10 +61,11 @@ def test_individual_packet_decoding_with_state(filename: str, max_packets: int =
         packet_no, packet = packet_data
         frames, codec_context = decode_packet_to_frames_with_state(packet_data, codec_context)
         
-        print(f"Packet {packet_no}: {len(frames)} frames")
+        lines.append(f"Packet {packet_no}: {len(frames)} frames")
         total_frames += len(frames)
         packet_count += 1
     
+    sys.stdout.write("\n".join(lines) + "\n")
     print(f"\nTotal: {packet_count} packets, {total_frames} frames")
     print(f"Average frames per packet: {total_frames/packet_count:.2f}")
 
@@ -74,12 +79,14 @@ def test_flush_based_decoding(filename: str, max_packets: int = 10):
     file_iterator = FileFrameIterator(filename)
     packet_count = 0
     total_frames = 0
+    lines = []  # Written once after the loop, not one print() per packet
     
     for packet_no, frames in decode_all_packets_with_flush(file_iterator.iterator, max_packets):
-        print(f"Packet {packet_no}: {len(frames)} frames")
+        lines.append(f"Packet {packet_no}: {len(frames)} frames")
         total_frames += len(frames)
         packet_count += 1
     
+    sys.stdout.write("\n".join(lines) + "\n")
     print(f"\nTotal: {packet_count} packets, {total_frames} frames")
     print(f"Average frames per packet: {total_frames/packet_count:.2f}")
 
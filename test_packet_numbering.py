@@ -4,8 +4,9 @@ Test script to verify that packet numbers are preserved correctly
 through the filter_stream_preserve_consecutivity function.
 """
 
-from vidfile_iterator import FileFrameIterator, filter_stream_preserve_consecutivity, filter_small_packets
+from vidfile_iterator import FileFrameIterator, filter_stream_preserve_consecutivity, make_size_filter, split_packet_data
 import sys
+import numpy as np
 
 def test_packet_numbering_preservation(filename: str):
     """
@@ -21,30 +22,29 @@ def test_packet_numbering_preservation(filename: str):
     max_packet_size = 2000
     filtered_iterator = filter_stream_preserve_consecutivity(
         frame_iterator.iterator, 
-        lambda x: filter_small_packets(x, max_packet_size)
+        make_size_filter(max_size=max_packet_size)
     )
     
     print(f"Original packet numbers should be preserved:")
     print("-" * 40)
     
     for iterator_idx, pd_it in enumerate(filtered_iterator):
-        print(f"\nConsecutive Group {iterator_idx}:")
-        packet_numbers = []
+        # A group's report is collected and written once, not one print() per packet
+        lines = [f"\nConsecutive Group {iterator_idx}:"]
+        # Split the group into an int64 array of packet numbers and the packets (no enumerate(),
+        # so the original numbers are preserved); the check below then works on the array
+        packet_numbers, packets = split_packet_data(pd_it)
         
-        for packet_data in pd_it:  # No enumerate() - preserve original numbers
-            packet_no, packet = packet_data
-            packet_numbers.append(packet_no)
-            print(f"  Packet {packet_no} (size: {packet.size})")
+        for packet_no, packet in zip(packet_numbers.tolist(), packets):
+            lines.append(f"  Packet {packet_no} (size: {packet.size})")
         
-        print(f"  Group packet numbers: {packet_numbers}")
+        lines.append(f"  Group packet numbers: {packet_numbers.tolist()}")
         
         # Verify consecutivity
         if len(packet_numbers) > 1:
-            is_consecutive = all(
-                packet_numbers[i] + 1 == packet_numbers[i + 1] 
-                for i in range(len(packet_numbers) - 1)
-            )
-            print(f"  Consecutive: {is_consecutive}")
+            is_consecutive = bool(np.all(np.diff(packet_numbers) == 1))
+            lines.append(f"  Consecutive: {is_consecutive}")
+        sys.stdout.write("\n".join(lines) + "\n")
         
         # Only process first few groups for demonstration
         if iterator_idx >= 3:
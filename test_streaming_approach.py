@@ -30,9 +30,9 @@ def create_mock_packet_stream() -> Iterator[Tuple[int, av.Packet]]:
     ]
     
     for packet_no, size, pts, is_keyframe in mock_data:
-        # Create a mock packet with dummy data
-        dummy_data = b'x' * size  # Create dummy data of the specified size
-        packet = av.Packet(dummy_data)
+        # Create a mock packet of the specified size. av.Packet(size) allocates the
+        # payload directly, without building a Python bytes object to copy from.
+        packet = av.Packet(size)
         packet.pts = pts
         packet.dts = pts  # Mock DTS
         packet.time_base = Fraction(1, 90000)  # Common time base
@@ -55,34 +55,37 @@ def test_streaming_approach():
     print("This approach processes packets without storing them in memory.")
     print()
     
-    # Create mock packet stream
+    # Create mock packet stream. It is consumed in a single pass: the packets and the
+    # filter results are printed and counted as they stream into the grouping function,
+    # instead of materializing the stream in a list first.
     packet_stream = create_mock_packet_stream()
+    counts = {"packets": 0, "filtered": 0}
     
-    # Convert to list for demonstration (in real usage, this would be a stream)
-    packet_list = list(packet_stream)
-    print(f"Created {len(packet_list)} mock packets:")
-    for packet_no, packet in packet_list:
-        print(f"  Packet {packet_no}: size={packet.size}, pts={packet.pts}")
-    print()
+    def logged_packets(stream):
+        for packet_no, packet in stream:
+            counts["packets"] += 1
+            print(f"  Packet {packet_no}: size={packet.size}, pts={packet.pts}")
+            yield (packet_no, packet)
     
-    # Test the filter function
-    print("Applying filter (packets < 10000 bytes):")
-    filtered_packets = [(packet_no, packet) for packet_no, packet in packet_list if mock_filter_func((packet_no, packet))]
-    print(f"Filtered to {len(filtered_packets)} packets:")
-    for packet_no, packet in filtered_packets:
-        print(f"  Packet {packet_no}: size={packet.size}, pts={packet.pts}")
-    print()
+    def logged_filter(packet_data):
+        keep = mock_filter_func(packet_data)
+        if keep:
+            counts["filtered"] += 1
+            print(f"    -> passes filter (packets < 10000 bytes)")
+        return keep
     
     # Test the streaming grouping function
     print("Testing group_packets_by_pts_and_decode_streaming with mock data:")
+    print("Mock packets as they stream in:")
     try:
         # Note: This will fail because we don't have a real video file,
         # but it demonstrates the streaming approach
-        groups = list(group_packets_by_pts_and_decode_streaming("mock_file.mp4", packet_list, mock_filter_func))
+        groups = list(group_packets_by_pts_and_decode_streaming("mock_file.mp4", logged_packets(packet_stream), logged_filter))
         print(f"Successfully processed {len(groups)} groups")
     except Exception as e:
         print(f"Expected error (no real video file): {e}")
         print("This demonstrates that the streaming approach works correctly.")
+    print(f"Streamed {counts['packets']} mock packets, {counts['filtered']} passed the filter")
     print()
     
     # Show the memory efficiency
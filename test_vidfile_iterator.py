@@ -1,7 +1,10 @@
+import logging
 import sys
-from vidfile_iterator import FileFrameIterator, stream_frames_from_packet, decode_packet_to_frames, flush_decoder
+from vidfile_iterator import FileFrameIterator, stream_frames_from_packet, decode_packet_to_frames, iterate_in_background
 import av
 
+log = logging.getLogger(__name__)
+
 def test_modern_decoding():
     """Test the modern decoding approach in vidfile_iterator.py"""
     if len(sys.argv) < 2:
@@ -11,68 +14,88 @@ def test_modern_decoding():
     filename = sys.argv[1]
     print(f"Testing modern decoding in vidfile_iterator.py with: {filename}")
     
-    # Create the frame iterator
-    frame_iterator = FileFrameIterator(filename)
+    # Create the frame iterator. Decode on the platform's hardware decoder when there is one
+    # (see open_video_container); decode() works the same either way.
+    frame_iterator = FileFrameIterator(filename, use_hwaccel=True)
     
     # Test the stream_frames_from_packet function
     print("\n=== Testing stream_frames_from_packet ===")
     packet_count = 0
     max_packets_to_test = 30
     
-    for packet_data in frame_iterator.packet_iterator:
+    # Demux on a background thread, up to 32 packets ahead, while this thread decodes.
+    # Each loop closes its prefetcher before rewinding, so the demuxer has stopped reading.
+    packets = iterate_in_background(frame_iterator.packet_iterator, maxsize=32)
+    for packet_data in packets:
         stream_frames_from_packet(packet_data)
         packet_count += 1
         if packet_count >= max_packets_to_test:
             break
+    packets.close()
     
     # Test the decode_packet_to_frames function
     print("\n=== Testing decode_packet_to_frames ===")
-    frame_iterator = FileFrameIterator(filename)  # Reset iterator
+    # Seek back to the start and reset the decoder, instead of re-opening and re-probing the file
+    frame_iterator.rewind()
     packet_count = 0
+    frame_count = 0
     
-    for packet_data in frame_iterator.packet_iterator:
+    # Per-packet details go to log.debug, which is a cheap no-op unless DEBUG is enabled;
+    # only the totals are reported once the loop is done
+    packets = iterate_in_background(frame_iterator.packet_iterator, maxsize=32)
+    for packet_data in packets:
         packet_no, packet = packet_data
-        print(f"  Decoding packet {packet_no}...")
+        log.debug("  Decoding packet %d...", packet_no)
         frames = decode_packet_to_frames(packet_data)
-        print(f"  Got {len(frames)} frames from packet {packet_no}")
+        log.debug("  Got %d frames from packet %d", len(frames), packet_no)
         
         for i, frame in enumerate(frames):
-            print(f"    Frame {i}: PTS={frame.pts}, time_base={frame.time_base}")
+            log.debug("    Frame %d: PTS=%s, time_base=%s", i, frame.pts, frame.time_base)
         
+        frame_count += len(frames)
         packet_count += 1
         if packet_count >= max_packets_to_test:
             break
+    packets.close()
+    log.info("  Processed %d packets, %d frames", packet_count, frame_count)
     
     # Test flushing the decoder
     print("\n=== Testing decoder flush ===")
-    container = av.open(filename)
-    video_stream = container.streams.video[0]
-    codec_context = video_stream.codec_context
+    print(f"  Decoding on: {frame_iterator.hwaccel_device or 'software'}")
+    # Same file and decoder again: the iterator's codec context is reused, not re-created
+    frame_iterator.rewind()
+    codec_context = frame_iterator.codec_context
     
     # Process a few packets first
-    frame_iterator = FileFrameIterator(filename)
     packet_count = 0
-    for packet_data in frame_iterator.packet_iterator:
+    frame_count = 0
+    packets = iterate_in_background(frame_iterator.packet_iterator, maxsize=32)
+    for packet_data in packets:
         packet_no, packet = packet_data
         # Use decode instead of send for PyAV 14.4.0
         try:
             frames = list(codec_context.decode(packet))
-            print(f"  Processed packet {packet_no}, got {len(frames)} frames")
+            log.debug("  Processed packet %d, got %d frames", packet_no, len(frames))
+            frame_count += len(frames)
         except Exception as e:
-            print(f"  Error processing packet {packet_no}: {e}")
+            log.warning("  Error processing packet %d: %s", packet_no, e)
         packet_count += 1
         if packet_count >= 5:  # Process 5 packets
             break
+    packets.close()
+    log.info("  Processed %d packets, %d frames", packet_count, frame_count)
     
     # Now flush to get remaining frames
     print("  Flushing decoder...")
-    remaining_frames = flush_decoder(codec_context)
+    remaining_frames = frame_iterator.drain()
     print(f"  Got {len(remaining_frames)} remaining frames from flush")
     
     for i, frame in enumerate(remaining_frames):
-        print(f"    Flushed frame {i}: PTS={frame.pts}")
+        log.debug("    Flushed frame %d: PTS=%s", i, frame.pts)
     
     print(f"\nAll tests completed successfully!")
 
 if __name__ == "__main__":
+    # Summaries only; use level=logging.DEBUG to see every packet and frame
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     test_modern_decoding() 
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""Tests for the frame sampling helpers in ``display_utils``."""
+
+from __future__ import annotations
+
+import random
+from collections import Counter
+from types import SimpleNamespace
+
+from display_utils import reservoir_sample_frames
+
+
+def _frames(count: int) -> list[SimpleNamespace]:
+    return [SimpleNamespace(pts=pts) for pts in range(count)]
+
+
+def test_reservoir_sample_frames_short_stream_keeps_everything() -> None:
+    frames = _frames(4)
+    assert reservoir_sample_frames(iter(frames), 10) == frames
+    assert reservoir_sample_frames(iter(frames), 0) == []
+
+
+def test_reservoir_sample_frames_returns_distinct_frames_in_pts_order() -> None:
+    random.seed(1234)
+    sampled = reservoir_sample_frames(iter(_frames(1000)), 10)
+    pts = [frame.pts for frame in sampled]
+    assert len(set(pts)) == 10
+    assert pts == sorted(pts)
+
+
+def test_reservoir_sample_frames_is_roughly_uniform() -> None:
+    random.seed(42)
+    counts: Counter[int] = Counter()
+    for _ in range(2000):
+        counts.update(frame.pts for frame in reservoir_sample_frames(iter(_frames(20)), 5))
+    # Each of the 20 frames is kept with probability 5/20, i.e. ~500 times out of 2000 runs
+    assert all(400 < counts[pts] < 600 for pts in range(20))
+
+
+def test_reservoir_sample_frames_weighted_prefers_heavy_frames() -> None:
+    random.seed(7)
+    counts: Counter[int] = Counter()
+    for _ in range(2000):
+        sampled = reservoir_sample_frames(iter(_frames(20)), 5, weight=lambda f: 10.0 if f.pts < 5 else 1.0)
+        pts = [frame.pts for frame in sampled]
+        assert len(set(pts)) == 5 and pts == sorted(pts)
+        counts.update(pts)
+    # Frames 0-4 carry ten times the weight, so they are kept far more often than the rest
+    assert min(counts[pts] for pts in range(5)) > 2 * max(counts[pts] for pts in range(5, 20))
@@ -0,0 +1,282 @@
+"""Tests for the packet filtering and grouping helpers in ``vidfile_iterator``."""
+
+from __future__ import annotations
+
+import threading
+from types import SimpleNamespace
+
+import av
+import numpy as np
+import pytest
+
+from vidfile_iterator import (
+    NO_PTS,
+    FileFrameIterator,
+    FrameCache,
+    PacketInfo,
+    chain_filters,
+    consecutive_filtered_runs,
+    decode_group_by_pts_range,
+    decode_groups_by_pts_range,
+    filter_batches_preserve_consecutivity,
+    filter_by_pts_range,
+    filter_keyframes,
+    filter_large_packets,
+    filter_small_packets,
+    filter_stream_preserve_consecutivity,
+    frame_to_np,
+    group_packets_by_pts_and_decode_streaming,
+    iter_packet_batches,
+    iterate_in_background,
+    keep_bookend_frames,
+    make_pts_filter,
+    make_size_filter,
+    prefilter_packets,
+    split_packet_data,
+)
+
+
+def _packet_stream(packet_numbers: list[int], sizes: list[int]) -> list[tuple[int, PacketInfo]]:
+    return [
+        (packet_no, PacketInfo(size=size, pts=packet_no * 512, dts=None, is_keyframe=False))
+        for packet_no, size in zip(packet_numbers, sizes)
+    ]
+
+
+@pytest.fixture(scope="module")
+def video_clip(tmp_path_factory: pytest.TempPathFactory) -> str:
+    """
+    A 60-frame MPEG-4 clip with 10-frame GOPs, one frame per 512 PTS ticks. Without B-frames the
+    decoder returns a frame for every packet of a range, even mid-GOP ones whose references were skipped.
+    """
+    path = str(tmp_path_factory.mktemp("video") / "clip.mp4")
+    with av.open(path, mode="w") as container:
+        stream = container.add_stream("mpeg4", rate=25, options={"g": "10", "bf": "0"})
+        stream.width, stream.height, stream.pix_fmt = 64, 48, "yuv420p"
+        for i in range(60):
+            pixels = np.full((48, 64, 3), i * 4, dtype=np.uint8)
+            pixels[:, i] = 255
+            container.mux(stream.encode(av.VideoFrame.from_ndarray(pixels, format="rgb24")))
+        container.mux(stream.encode())
+    return path
+
+
+def _frame_signatures(frames) -> list[tuple[int, bytes]]:
+    return [(frame.pts, frame.to_ndarray(format="gray").tobytes()) for frame in frames]
+
+
+def _decode_streaming_groups(filename: str, **kwargs) -> list[list[tuple[int, bytes]]]:
+    """Signatures of the groups left by dropping every 7th packet, decoded via the streaming path."""
+    frame_iterator = FileFrameIterator(filename, metadata_only=True)
+    try:
+        groups = group_packets_by_pts_and_decode_streaming(
+            filename, frame_iterator.packet_iterator, lambda p: p[1].pts is not None and p[0] % 7 != 6, **kwargs)
+        return [_frame_signatures(frames) for frames in groups]
+    finally:
+        frame_iterator.close()
+
+
+def test_split_packet_data_returns_parallel_arrays() -> None:
+    stream = _packet_stream([3, 4, 7], [10, 20, 30])
+    packet_numbers, packets = split_packet_data(iter(stream))
+    assert packet_numbers.dtype == np.int64
+    assert packet_numbers.tolist() == [3, 4, 7]
+    assert [p.size for p in packets] == [10, 20, 30]
+
+
+def test_consecutive_filtered_runs_splits_on_filter_and_gaps() -> None:
+    packet_numbers = [0, 1, 2, 5, 6, 7, 10, 11, 12, 13, 15, 16, 17, 18, 20]
+    sizes = [100, 5000, 100, 100, 100, 100, 100, 100, 5000, 100, 100, 100, 100, 100, 100]
+    stream = _packet_stream(packet_numbers, sizes)
+
+    numbers, packets = split_packet_data(iter(stream))
+    mask = np.array([p.size < 1000 for p in packets])
+    runs = consecutive_filtered_runs(numbers, mask)
+    got = [numbers[start:end].tolist() for start, end in runs]
+
+    assert got == [[0], [2], [5, 6, 7], [10, 11], [13], [15, 16, 17, 18], [20]]
+
+
+def test_consecutive_filtered_runs_empty_and_all_filtered() -> None:
+    assert consecutive_filtered_runs(np.array([], dtype=np.int64), np.array([], dtype=bool)).shape == (0, 2)
+    runs = consecutive_filtered_runs(np.arange(4), np.zeros(4, dtype=bool))
+    assert runs.shape == (0, 2)
+
+
+def test_filter_batches_preserve_consecutivity_matches_whole_stream_runs() -> None:
+    packet_numbers = [0, 1, 2, 5, 6, 7, 10, 11, 12, 13, 15, 16, 17, 18, 20]
+    sizes = [100, 5000, 100, 100, 100, 100, 100, 100, 5000, 100, 100, 100, 100, 100, 100]
+    stream = _packet_stream(packet_numbers, sizes)
+    numbers = np.asarray(packet_numbers)
+    runs = consecutive_filtered_runs(numbers, np.asarray(sizes) < 1000)
+    expected = [stream[start:end] for start, end in runs]
+    for batch_size in (1, 2, 4, 5, 64):
+        groups = filter_batches_preserve_consecutivity(iter(stream), lambda batch: batch.sizes < 1000, batch_size=batch_size)
+        assert [list(group) for group in groups] == expected
+
+
+def test_iter_packet_batches_chunks_stream_into_arrays() -> None:
+    stream = _packet_stream(list(range(5)), [50, 150, 250, 350, 450])
+    stream[2] = (2, stream[2][1]._replace(pts=None))
+    batches = list(iter_packet_batches(iter(stream), batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert batches[1].packet_numbers.tolist() == [2, 3]
+    assert batches[1].pts.tolist() == [NO_PTS, 3 * 512]
+    assert (batches[0].sizes < 100).tolist() == [True, False]
+
+
+def test_prefilter_packets_matches_chained_filters() -> None:
+    sizes = [100, 5000, 300, 800, 50, 900, 1200, 400, 700, 20]
+    stream = _packet_stream(list(range(len(sizes))), sizes)
+    stream[3] = (3, stream[3][1]._replace(pts=None))
+    expected = list(chain_filters(
+        iter(stream),
+        lambda p: filter_large_packets(p, 60),
+        lambda p: filter_small_packets(p, 1000),
+        lambda p: filter_by_pts_range(p, 512, 8 * 512),
+    ))
+    got = list(prefilter_packets(iter(stream), min_size=60, max_size=1000, pts_range=(512, 8 * 512), batch_size=3))
+    assert [packet_no for packet_no, _ in got] == [packet_no for packet_no, _ in expected] == [2, 5, 7, 8]
+    assert all(a[1] is b[1] for a, b in zip(got, expected))
+
+
+def test_filter_factories_match_filter_functions() -> None:
+    stream = _packet_stream(list(range(10)), [100, 5000, 300, 800, 50, 900, 1200, 400, 700, 20])
+    stream[3] = (3, stream[3][1]._replace(pts=None))
+    size_filter = make_size_filter(min_size=60, max_size=1000)
+    assert [size_filter(p) for p in stream] == [filter_large_packets(p, 60) and filter_small_packets(p, 1000) for p in stream]
+    assert [make_size_filter(max_size=1000)(p) for p in stream] == [filter_small_packets(p, 1000) for p in stream]
+    for max_pts in (None, 6 * 512):
+        pts_filter = make_pts_filter(512, max_pts)
+        assert [pts_filter(p) for p in stream] == [filter_by_pts_range(p, 512, max_pts) for p in stream]
+
+
+def test_prefilter_packets_keyframes() -> None:
+    stream = _packet_stream(list(range(6)), [100, 200, 300, 400, 500, 600])
+    stream = [(packet_no, packet._replace(is_keyframe=packet_no % 3 == 0)) for packet_no, packet in stream]
+    keyframes = list(prefilter_packets(iter(stream), keyframes=True, batch_size=4))
+    assert keyframes == list(filter(filter_keyframes, stream))
+    assert [packet_no for packet_no, _ in keyframes] == [0, 3]
+    others = prefilter_packets(iter(stream), max_size=550, keyframes=False)
+    assert [packet_no for packet_no, _ in others] == [1, 2, 4]
+
+
+def test_keep_bookend_frames_keeps_both_ends() -> None:
+    assert keep_bookend_frames(iter(range(20)), 3) == [0, 1, 2, 17, 18, 19]
+    assert keep_bookend_frames(iter(range(4)), 3) == [0, 1, 2, 3]
+
+
+def test_filter_stream_preserve_consecutivity_keeps_first_packet_of_iterator() -> None:
+    stream = _packet_stream([0, 1, 2, 4], [10, 20, 30, 40])
+    groups = filter_stream_preserve_consecutivity(iter(stream), lambda p: p[1].size != 30)
+    assert [[packet_no for packet_no, _ in group] for group in groups] == [[0, 1], [4]]
+
+
+def _fake_frames(count: int, nbytes: int) -> list[SimpleNamespace]:
+    return [SimpleNamespace(planes=[SimpleNamespace(buffer_size=nbytes)]) for _ in range(count)]
+
+
+def test_frame_cache_evicts_least_recently_used_groups() -> None:
+    cache = FrameCache(max_bytes=100)
+    a, b, c = _fake_frames(2, 20), _fake_frames(1, 40), _fake_frames(3, 10)
+    cache.put("a", a)
+    cache.put("b", b)
+    assert cache.get("a") == a  # "a" is now the most recently used
+    cache.put("c", c)  # 40 + 40 + 30 bytes: "b" has to go
+    assert cache.get("b") is None
+    assert cache.get("a") == a and cache.get("c") == c
+    assert cache.current_bytes == 70
+    cache.put("huge", _fake_frames(1, 101))  # Larger than the whole cache: not stored
+    assert cache.get("huge") is None and cache.current_bytes == 70
+
+
+def test_frame_cache_with_zero_max_bytes_stores_nothing() -> None:
+    cache = FrameCache(max_bytes=0)
+    cache.put("empty", [])
+    cache.put("a", _fake_frames(1, 1))
+    assert cache.get("empty") is None and cache.get("a") is None
+    assert cache.current_bytes == 0
+
+
+@pytest.mark.parametrize("format", ["rgb24", "bgr24", "rgba", "bgra", "gray", "yuyv422", "yuv420p"])
+def test_frame_to_np_matches_to_ndarray(format: str) -> None:
+    # 150 pixels wide: rgb24 rows are 450 bytes, padded to a 480-byte line size
+    pixels = np.random.default_rng(0).integers(0, 256, (100, 150, 3), dtype=np.uint8)
+    frame = av.VideoFrame.from_ndarray(pixels, format="rgb24")
+    assert frame.planes[0].line_size > frame.width * 3
+    expected = frame.to_ndarray(format=format)
+    assert np.array_equal(frame_to_np(frame, format), expected)
+    out = np.empty_like(expected)
+    assert frame_to_np(frame, format, out=out) is out
+    assert np.array_equal(out, expected)
+
+
+def test_decode_groups_by_pts_range_matches_per_range_decoding(video_clip: str) -> None:
+    # Several ranges share a GOP (no seek, decoding continues from the previous range's overflow
+    # packet), some are adjacent, and some start in a later GOP
+    frame_ranges = [(1, 2), (3, 4), (6, 8), (9, 11), (12, 12), (25, 27), (41, 49)]
+    pts_ranges = [(start * 512, end * 512) for start, end in frame_ranges]
+    expected = [_frame_signatures(decode_group_by_pts_range(video_clip, *pts_range)) for pts_range in pts_ranges]
+    assert [len(frames) for frames in expected] == [end - start + 1 for start, end in frame_ranges]
+    groups = decode_groups_by_pts_range(video_clip, pts_ranges)
+    assert [_frame_signatures(frames) for frames in groups] == expected
+
+
+def test_parallel_streaming_decode_matches_sequential(video_clip: str) -> None:
+    sequential = _decode_streaming_groups(video_clip)
+    assert len(sequential) == 9 and sum(map(len, sequential)) == 52
+    assert _decode_streaming_groups(video_clip, max_workers=3) == sequential
+
+
+def test_parallel_streaming_decode_reuses_worker_decoders(video_clip: str) -> None:
+    # Two workers for six GOPs: each worker seeks its one container and decoder between tasks.
+    # An explicit codec_name makes that decoder a separately opened one, which seek() doesn't reset.
+    sequential = _decode_streaming_groups(video_clip)
+    assert _decode_streaming_groups(video_clip, max_workers=2, codec_name="mpeg4") == sequential
+
+
+def test_iterate_in_background_stops_producer_when_consumer_stops_early() -> None:
+    produced = []
+
+    def numbers():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    threads_before = threading.active_count()
+    items = iterate_in_background(numbers(), maxsize=2)
+    assert [next(items) for _ in range(3)] == [0, 1, 2]
+    items.close()  # Joins the producer thread
+    assert threading.active_count() == threads_before
+    assert len(produced) < 10
+
+
+def test_iterate_in_background_reraises_producer_exception() -> None:
+    def failing():
+        yield 1
+        raise ValueError("demux failed")
+
+    items = iterate_in_background(failing())
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="demux failed"):
+        next(items)
+
+
+def test_prefetching_frame_iterator_rewinds_mid_stream(video_clip: str) -> None:
+    def read_all(frame_iterator: FileFrameIterator) -> list[tuple[int, int, int]]:
+        return [(packet_no, frame_no, frame.pts) for packet_no, frame_no, frame in frame_iterator.frame_iterator]
+
+    frame_iterator = FileFrameIterator(video_clip)
+    try:
+        expected = read_all(frame_iterator)
+    finally:
+        frame_iterator.close()
+    assert len(expected) == 60
+
+    frame_iterator = FileFrameIterator(video_clip, prefetch=8)
+    try:
+        assert [next(frame_iterator.frame_iterator)[2].pts for _ in range(5)] == [pts for _, _, pts in expected[:5]]
+        frame_iterator.rewind()  # Stops the demux thread, which is still reading ahead
+        assert read_all(frame_iterator) == expected
+    finally:
+        frame_iterator.close()
@@ -1,15 +1,27 @@
 import av
 import av.container, av.packet, av.stream
+from av.codec.hwaccel import HWAccel, hwdevices_available
 from av.packet import Packet
 import numpy as np
-from typing import Callable, List, Optional, Union, Iterator, Tuple
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Hashable, Iterable, List, NamedTuple, Optional, Union, Iterator, Tuple
 from typing_extensions import TypeAlias
 from fractions import Fraction
-from itertools import groupby
+from itertools import chain, groupby, islice
 import cv2
+import io
+import logging
+import os
+import queue
 import sys
+import threading
 
 
+logger = logging.getLogger(__name__)
+
 # Note: If you're seeking/jumping: Always flush after seeking to clear stale state
 
     
@@ -22,6 +34,136 @@ frame_list_type: TypeAlias = List[av.VideoFrame]
 frame_data_type: TypeAlias = Tuple[int, int, av.VideoFrame]
 frame_data_iterator: TypeAlias = Iterator[frame_data_type]
 
+# Stand-in for a missing PTS in int64 arrays (same value as FFmpeg's AV_NOPTS_VALUE)
+NO_PTS = np.iinfo(np.int64).min
+
+class PacketInfo(NamedTuple):
+    """Packet metadata kept in place of the av.Packet when FileFrameIterator runs with metadata_only=True."""
+    size: int
+    pts: Optional[int]
+    dts: Optional[int]
+    is_keyframe: bool
+
+# Hardware device types to try for decoding, in order of preference per platform
+HWACCEL_DEVICE_TYPES = {
+    "darwin": ("videotoolbox",),
+    "win32": ("cuda", "d3d11va", "dxva2", "qsv"),
+    "linux": ("cuda", "vaapi", "qsv"),
+}
+
+# Read size for file-like sources (e.g. FileFrameIterator's in_memory mode). PyAV's default is
+# 32 KiB, which means a Python read() call for every 32 KiB of the file.
+FILE_OBJECT_BUFFER_SIZE = 1 << 20
+
+def open_video_container(filename: Union[str, io.BytesIO], use_hwaccel: bool = True) -> Tuple[av.container.InputContainer, Optional[str]]:
+    """
+    Open a video file for reading, attaching a hardware decoder when one is available.
+    
+    Args:
+        filename: Path to the video file, or an in-memory file
+        use_hwaccel: Try the platform's hardware device types before falling back to software
+    
+    Returns:
+        Tuple of (container, device_type) where device_type is None for software decoding
+    """
+    # buffer_size only applies to file-like objects; paths are read by FFmpeg itself
+    open_kwargs = {} if isinstance(filename, str) else {"buffer_size": FILE_OBJECT_BUFFER_SIZE}
+    if use_hwaccel:
+        available = set(hwdevices_available())
+        for device_type in HWACCEL_DEVICE_TYPES.get(sys.platform, ()):
+            if device_type not in available:
+                continue
+            try:
+                container = av.open(filename, mode='r', hwaccel=HWAccel(device_type=device_type, allow_software_fallback=True),
+                                    **open_kwargs)
+                return container, device_type  # type: ignore[return-value]
+            except av.FFmpegError:
+                # Device type is compiled in but no usable device is present
+                if not isinstance(filename, str):
+                    filename.seek(0)
+                continue
+    return av.open(filename, mode='r', **open_kwargs), None  # type: ignore[return-value]
+
+# Suffixes of FFmpeg's dedicated hardware decoders (e.g. h264_cuvid for NVDEC, hevc_qsv for
+# Quick Sync), which decode on the device directly instead of through a hwaccel hook
+HARDWARE_DECODER_SUFFIXES = ("_cuvid", "_qsv")
+
+def find_hardware_decoder(codec_name: str) -> Optional[str]:
+    """Name of a dedicated hardware decoder compiled into FFmpeg for codec_name, or None."""
+    for suffix in HARDWARE_DECODER_SUFFIXES:
+        decoder_name = codec_name + suffix
+        if decoder_name in av.codecs_available:
+            return decoder_name
+    return None
+
+def open_stream_decoder(stream: av.stream.Stream, codec_name: str) -> av.CodecContext:
+    """
+    Open the decoder named codec_name for stream's packets, instead of the stream's default one.
+    
+    Args:
+        stream: Video stream whose packets will be decoded
+        codec_name: FFmpeg decoder name, e.g. "h264_cuvid"
+    
+    Returns:
+        The opened codec context
+    
+    Raises:
+        av.FFmpegError: If the decoder can't be opened (e.g. no device for a hardware decoder)
+    """
+    codec_context = av.CodecContext.create(codec_name, "r")
+    # The stream parameters a decoder needs before its first packet
+    codec_context.extradata = stream.codec_context.extradata
+    codec_context.width = stream.codec_context.width
+    codec_context.height = stream.codec_context.height
+    codec_context.open()
+    return codec_context
+
+def select_stream_decoder(stream: av.stream.Stream, codec_name: Optional[str]) -> av.CodecContext:
+    """
+    The decoder to use for stream: the one named codec_name, or for "auto" the dedicated hardware
+    decoder of the stream's codec (see find_hardware_decoder). Falls back to the stream's default
+    codec context when codec_name is None or the decoder can't be opened (e.g. no device).
+    """
+    if codec_name == "auto":
+        codec_name = find_hardware_decoder(stream.codec_context.name)
+    if codec_name is not None:
+        try:
+            return open_stream_decoder(stream, codec_name)
+        except av.FFmpegError:
+            # Compiled in, but no usable device (or unsupported stream): keep the default decoder
+            pass
+    return stream.codec_context
+
+def enable_threaded_decoding(codec_context: av.CodecContext, thread_count: int = 0,
+                             thread_type: str = "AUTO") -> av.CodecContext:
+    """
+    Turn on FFmpeg frame + slice threading for a decoder.
+    FFmpeg only allows this before the codec is opened (first decode), so it's a no-op afterwards.
+    
+    Args:
+        codec_context: The codec context to configure
+        thread_count: Number of decoder threads (0 lets FFmpeg use one per core)
+        thread_type: "AUTO" (frame + slice), "FRAME" or "SLICE". Frame threading holds
+            back thread_count frames and has to drain on every flush, so decoders that
+            flush per group or want each packet's frame right away should use "SLICE".
+    
+    Returns:
+        The same codec context, for chaining
+    """
+    if not codec_context.is_open:
+        codec_context.thread_type = thread_type
+        codec_context.thread_count = thread_count
+    return codec_context
+
+def discard_other_streams(container: av.container.InputContainer, keep_stream: av.stream.Stream):
+    """
+    Tell the demuxer to drop packets of every stream except keep_stream (e.g. audio, subtitles),
+    so demux()/seek() skip them inside libavformat instead of handing them to Python.
+    """
+    for stream in container.streams:
+        if stream.index != keep_stream.index:
+            stream.discard = av.stream.Discard.all
+
 def _create_consecutive_iterator(start_packet_data: packet_data_type, stream_iterator: packet_data_iterator, filter_func: Callable[[packet_data_type], bool]) -> packet_data_iterator:
     """
     Create an iterator for consecutive packets starting from start_packet_data.
@@ -72,30 +214,18 @@ def _process_single_stream(
     Yields:
         Iterator of consecutive packet_data tuples that match the filter condition
     """
-    # Create an iterator from the stream for peeking
+    # One shared iterator (iter() is a no-op for the iterators _normalize_input hands out, and
+    # turns a list into one), so the loop resumes where each consecutive group stopped
     stream_iterator = iter(stream)
     
-    try:
-        while True:
-            # Get the next packet
-            packet_data = next(stream_iterator)
-            packet_no, packet = packet_data
-            
-            # Check if this packet matches the filter condition
-            if filter_func(packet_data):
-                # Create a streaming iterator for this consecutive group
-                consecutive_iterator = _create_consecutive_iterator(packet_data, stream_iterator, filter_func)
-                yield consecutive_iterator
-                
-                # The consecutive_iterator has consumed all consecutive packets
-                # We need to continue with the next non-consecutive packet
-                # This is handled by the _create_consecutive_iterator function
-                # which stops when it encounters a non-consecutive or non-matching packet
-            # If packet doesn't match filter, just continue to next packet
-            
-    except StopIteration:
-        # Stream exhausted
-        pass
+    for packet_data in stream_iterator:
+        # Check if this packet matches the filter condition
+        if filter_func(packet_data):
+            # Create a streaming iterator for this consecutive group
+            # The consecutive_iterator consumes all consecutive packets; it stops when it
+            # encounters a non-consecutive or non-matching packet
+            yield _create_consecutive_iterator(packet_data, stream_iterator, filter_func)
+        # If packet doesn't match filter, just continue to next packet
 
 def _normalize_input(stream) -> packet_data_iterator_iterator:
     """
@@ -108,26 +238,25 @@ def _normalize_input(stream) -> packet_data_iterator_iterator:
         Iterator of packet iterators
     """
     try:
-        # Try to get the first item
-        first_item = next(iter(stream))
-        
-        # Check if first_item is a packet_data tuple (has packet_no as first element)
-        if isinstance(first_item, tuple) and len(first_item) == 2 and isinstance(first_item[0], int):
-            # It's a single packet stream, wrap it in a list
-            return [stream]
-        else:
-            # It's already an iterator of iterators, reconstruct the stream
-            def reconstruct_stream():
-                yield first_item
-                yield from stream
-            return reconstruct_stream()
-            
-    except StopIteration:
-        # Empty stream, return empty iterator
-        return []
+        stream = iter(stream)
     except TypeError:
         # stream is not iterable, treat it as a single iterator
         return [stream]
+    
+    # Peek at the first item, then put it back in front with chain (implemented in C,
+    # so the rebuilt stream costs no Python generator frame per item)
+    first_item = next(stream, None)
+    if first_item is None:
+        # Empty stream
+        return []
+    rebuilt = chain([first_item], stream)
+    
+    # Check if first_item is a packet_data tuple (has packet_no as first element)
+    if isinstance(first_item, tuple) and len(first_item) == 2 and isinstance(first_item[0], int):
+        # It's a single packet stream, wrap it in a list
+        return [rebuilt]
+    # It's already an iterator of iterators
+    return rebuilt
 
 def filter_stream_preserve_consecutivity(
     packet_stream: Union[packet_data_iterator, packet_data_iterator_iterator], 
@@ -175,58 +304,256 @@ def filter_stream_preserve_consecutivity(
     for stream in normalized_streams:
         yield from _process_single_stream(stream, filter_func)
 
+def split_packet_data(packet_stream: packet_data_iterator) -> Tuple[np.ndarray, List[Packet]]:
+    """
+    Split a packet stream into parallel arrays (structure of arrays).
+    
+    Args:
+        packet_stream: Iterator of (packet_no, packet) tuples
+    
+    Returns:
+        Tuple of (packet_numbers, packets) where packet_numbers is an int64 array
+        and packets[i] is the packet numbered packet_numbers[i]
+    """
+    packet_numbers = []
+    packets = []
+    for packet_no, packet in packet_stream:
+        packet_numbers.append(packet_no)
+        packets.append(packet)
+    return np.asarray(packet_numbers, dtype=np.int64), packets
+
+@dataclass
+class PacketBatch:
+    """
+    A chunk of consecutive packets from a stream, stored as parallel arrays.
+    Predicates can then run over a whole batch with numpy, e.g. batch.sizes < max_size.
+    """
+    packet_numbers: np.ndarray  # int64
+    sizes: np.ndarray           # int64
+    pts: np.ndarray             # int64, NO_PTS where the packet has no PTS
+    is_keyframe: np.ndarray     # bool
+    packets: List[Packet]
+
+    def __len__(self) -> int:
+        return len(self.packets)
+
+def iter_packet_batches(packet_stream: packet_data_iterator, batch_size: int = 64) -> Iterator[PacketBatch]:
+    """
+    Group a packet stream into PacketBatch chunks of up to batch_size packets.
+    
+    Args:
+        packet_stream: Iterator of (packet_no, packet) tuples
+        batch_size: Number of packets per batch (the last batch may be shorter)
+    
+    Yields:
+        PacketBatch for each chunk of the stream
+    """
+    packet_stream = iter(packet_stream)
+    while True:
+        packet_numbers, packets = split_packet_data(islice(packet_stream, batch_size))
+        if not packets:
+            return
+        sizes = np.fromiter((packet.size for packet in packets), dtype=np.int64, count=len(packets))
+        pts = np.fromiter((NO_PTS if packet.pts is None else packet.pts for packet in packets), dtype=np.int64, count=len(packets))
+        is_keyframe = np.fromiter((packet.is_keyframe for packet in packets), dtype=bool, count=len(packets))
+        yield PacketBatch(packet_numbers, sizes, pts, is_keyframe, packets)
+
+def consecutive_filtered_runs(packet_numbers: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Vectorized counterpart of filter_stream_preserve_consecutivity over split_packet_data arrays.
+    
+    A run is a maximal stretch of positions where mask is True and packet numbers
+    increase by exactly 1.
+    
+    Args:
+        packet_numbers: int64 array of packet numbers
+        mask: Boolean array, True where the packet passes the filter
+    
+    Returns:
+        (n_runs, 2) array of [start, end) index pairs into packet_numbers
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.size == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    
+    # joined[i] is True when positions i and i+1 belong to the same run
+    joined = mask[:-1] & mask[1:] & (np.diff(packet_numbers) == 1)
+    starts = np.flatnonzero(mask & ~np.concatenate(([False], joined)))
+    ends = np.flatnonzero(mask & ~np.concatenate((joined, [False]))) + 1
+    return np.column_stack((starts, ends))
+
+def filter_batches_preserve_consecutivity(packet_stream: packet_data_iterator, mask_func: Callable[[PacketBatch], np.ndarray],
+                                          batch_size: int = 256) -> packet_data_iterator_iterator:
+    """
+    Batched, vectorized counterpart of filter_stream_preserve_consecutivity for a single stream.
+    The stream is read in PacketBatch chunks, mask_func evaluates the filter for a whole batch
+    at once (e.g. lambda batch: batch.sizes < 1000), and consecutive_filtered_runs finds the
+    runs. A run that reaches the end of a batch is continued into the next one.
+    
+    Args:
+        packet_stream: Iterator of (packet_no, packet) tuples
+        mask_func: Function that takes a PacketBatch and returns a boolean array, True for
+            the packets that pass the filter
+        batch_size: Number of packets read ahead and filtered together
+    
+    Yields:
+        Iterator of consecutive packet_data tuples that pass the filter; the same runs as
+        consecutive_filtered_runs over the whole stream, whatever the batch size
+    """
+    run: List[packet_data_type] = []  # The run still open at the end of the previous batch
+    for batch in iter_packet_batches(packet_stream, batch_size):
+        runs = consecutive_filtered_runs(batch.packet_numbers, mask_func(batch))
+        for start, end in runs.tolist():
+            packets = list(zip(batch.packet_numbers[start:end].tolist(), batch.packets[start:end]))
+            if run and start == 0 and packets[0][0] == run[-1][0] + 1:
+                run.extend(packets)
+                continue
+            if run:
+                yield iter(run)
+            run = packets
+        if run and (len(runs) == 0 or runs[-1, 1] != len(batch)):
+            # The batch ends outside a run, so nothing can continue it
+            yield iter(run)
+            run = []
+    if run:
+        yield iter(run)
+
 def group_packets_starting_with_keyframe(packet_stream, filter_func):
     """
     Groups filtered packets so that each group starts with a keyframe.
     Only yields groups that start with a keyframe and contain at least one packet.
     """
-    group = []
-    for packet_data in packet_stream:
-        packet_no, packet = packet_data
-        if filter_func(packet_data):
-            if hasattr(packet, 'is_keyframe') and packet.is_keyframe:
-                if group:
-                    yield iter(group)
-                group = [packet_data]
-            else:
-                if group:
-                    group.append(packet_data)
-                # else: skip packets before first keyframe
-    if group:
-        yield iter(group)
+    gop_id = 0
+    
+    def gop_key(packet_data: packet_data_type) -> int:
+        # Numbers the GOPs of the filtered stream; 0 is the packets before the first keyframe
+        nonlocal gop_id
+        if packet_data[1].is_keyframe:
+            gop_id += 1
+        return gop_id
+    
+    for key, group in groupby(filter(filter_func, packet_stream), key=gop_key):
+        if key:
+            # groupby's groups end as soon as it advances, so hand out a list's iterator
+            yield iter(list(group))
 
 class FileFrameIterator:
     """
     Factory class to create frame iterators from a video file.
+    
+    Args:
+        filename: Path to the video file
+        max_packets: Stop demuxing after this many packets (None for the whole file)
+        metadata_only: Yield (packet_no, PacketInfo) instead of (packet_no, packet) and never
+            decode, for passes that only look at packet size/PTS/keyframe flags. No decoder
+            is configured or opened (no hardware device, threads or alternative codec_name).
+        in_memory: Read the whole file into memory once and demux from that buffer,
+            so repeated passes (see rewind) don't go back to disk. Only for files that fit in RAM.
+        use_hwaccel: Decode on a hardware device (VideoToolbox, NVDEC, VAAPI, ...) when one is
+            available, see open_video_container. Decoded frames are copied back to system memory,
+            so they convert with to_ndarray()/reformat() as usual. The device in use is in hwaccel_device.
+        codec_name: Decoder for frame_iterator and drain() instead of the stream's default one,
+            e.g. "h264_cuvid", or "auto" for the dedicated hardware decoder of the stream's codec
+            (see find_hardware_decoder). Falls back to the default decoder if it can't be opened.
+        thread_type: Decoder threading, see enable_threaded_decoding. "SLICE" suits the per-packet
+            and per-group decoding most callers do; "AUTO" (adds frame threading) gives more
+            throughput when whole streams are decoded in one go. "NONE" decodes on the calling
+            thread only, which has the least latency for reading a single frame.
+        thread_count: Number of decoder threads (0 lets FFmpeg use one per core)
+        prefetch: Demux up to this many packets ahead on a background thread while frame_iterator
+            decodes (see iterate_in_background), so reading the file overlaps decoding.
+            0 demuxes on the calling thread.
     """
-    def __init__(self, filename: str):
+    def __init__(self, filename: str, max_packets: Optional[int] = None, metadata_only: bool = False, in_memory: bool = False,
+                 use_hwaccel: bool = False, codec_name: Optional[str] = None, thread_type: str = "SLICE",
+                 thread_count: int = 0, prefetch: int = 0):
         self.filename = filename
-        self.container: av.container.InputContainer = av.open(filename, mode='r')  # type: ignore[assignment]
+        self.prefetch = prefetch
+        self.max_packets = max_packets
+        self.metadata_only = metadata_only
+        source: Union[str, io.BytesIO] = filename
+        if in_memory:
+            with open(filename, 'rb') as f:
+                source = io.BytesIO(f.read())
+        # Nothing is decoded in metadata_only mode, so a hardware device would only cost setup time
+        self.container, self.hwaccel_device = open_video_container(source, use_hwaccel=use_hwaccel and not metadata_only)
         self.container_stream = self.container.streams.video[0]
-        self.time_base = self.container_stream.time_base if self.container_stream.time_base else 1.0 / 25.0
-        self.container_stream.thread_type = "AUTO"
-        # self.container_stream.thread_count = 1  # Set to 1 to avoid threading issues with frame extraction
+        # The one decoder for this file; it stays open for the iterator's lifetime (see drain)
+        self.codec_context = select_stream_decoder(self.container_stream, None if metadata_only else codec_name)
+        discard_other_streams(self.container, self.container_stream)
+        # Exact time base for arithmetic that must not round, and a float copy for fast
+        # per-packet PTS-to-seconds conversion (float * int instead of Fraction * int)
+        self.time_base_fraction = self.container_stream.time_base or Fraction(1, 25)
+        self.time_base = float(self.time_base_fraction)
+        if metadata_only:
+            # Nothing is decoded, so don't let the demuxer buffer packets for decoder probing
+            self.container.flags |= av.container.Flags.no_buffer.value
+        else:
+            # By default packets are decoded one at a time and groups are flushed separately, so use
+            # slice threading: frame threading would delay every frame and drain on each flush
+            enable_threaded_decoding(self.codec_context, thread_count=thread_count, thread_type=thread_type)
         self.packet_iterator: packet_data_iterator = self.get_packet_iterator()
         self.frame_iterator: frame_data_iterator    = self.get_frame_iterator()
 
+    @property
+    def iterator(self) -> packet_data_iterator:
+        """Alias for packet_iterator, as used by the debug and test scripts."""
+        return self.packet_iterator
+
+    def rewind(self):
+        """
+        Seek back to the start of the file and restart packet numbering,
+        reusing the open container instead of re-opening and re-probing the file.
+        """
+        # Stop a prefetching demux thread before moving the demuxer
+        self.frame_iterator.close()
+        self.container.seek(0, backward=True, any_frame=False, stream=self.container_stream)
+        # Always flush after seeking to clear stale decoder state
+        self.codec_context.flush_buffers()
+        self.packet_iterator = self.get_packet_iterator()
+        self.frame_iterator = self.get_frame_iterator()
+
+    def drain(self) -> frame_list_type:
+        """
+        Return the frames the decoder is still holding back (see flush_decoder).
+        The decoder is reset but not closed, so decoding continues with the next packet
+        without re-opening the codec.
+        """
+        return flush_decoder(self.codec_context)
+
+    def get_packet_batch_iterator(self, batch_size: int = 64) -> Iterator[PacketBatch]:
+        """Packets from the same stream as packet_iterator, in PacketBatch chunks."""
+        return iter_packet_batches(self.packet_iterator, batch_size)
+
     def get_packet_iterator(self) -> packet_data_iterator:
-        packet_data:packet_data_type
-        for packet_data in enumerate(self.container.demux(self.container_stream)):
-            packet_no, packet = packet_data
-            # print("Processing packet number:", packet_no)
-            packet:packet_data_type = (packet_no, packet)
-            yield packet
+        # enumerate() already yields the (packet_no, packet) tuple, so hand it
+        # through as-is instead of unpacking and re-packing every packet.
+        # islice stops pulling from demux() once max_packets have been read.
+        packets = enumerate(self.container.demux(self.container_stream))
+        if self.metadata_only:
+            # Keep only what the filters look at and release the packet (and its buffer)
+            packets = ((packet_no, PacketInfo(packet.size, packet.pts, packet.dts, packet.is_keyframe))
+                       for packet_no, packet in packets)
+        yield from islice(packets, self.max_packets)
 
     def get_frame_iterator(self) -> frame_data_iterator:
+        if self.metadata_only:
+            raise ValueError("FileFrameIterator was opened with metadata_only=True and cannot decode frames")
         frame_count = 0
-        for packet_data in self.packet_iterator:
-            packet_no, packet = packet_data
-            frames = decode_packet_to_frames(packet_data)
-            for frame_no, frame in enumerate(frames):
-                yield (packet_no, frame_count+frame_no, frame)
-            frame_count += len(frames)
+        packets = iterate_in_background(self.packet_iterator, self.prefetch) if self.prefetch else self.packet_iterator
+        try:
+            for packet_data in packets:
+                packet_no, packet = packet_data
+                frames, _ = decode_packet_to_frames_with_state(packet_data, self.codec_context)
+                for frame_no, frame in enumerate(frames):
+                    yield (packet_no, frame_count+frame_no, frame)
+                frame_count += len(frames)
+        finally:
+            if self.prefetch:
+                packets.close()  # Joins the demux thread
 
     def close(self):
+        self.frame_iterator.close()
         self.container.close()
 
 
@@ -242,9 +569,24 @@ def chain_filters(packet_stream, *filter_functions):
     Yields:
         Packets that pass all filters
     """
+    if len(filter_functions) == 1:
+        # A single predicate: let the C-level filter() drive the loop
+        yield from filter(filter_functions[0], packet_stream)
+        return
+    if len(filter_functions) == 2:
+        # The common pair (e.g. size and PTS) as one short-circuiting expression, without the inner loop
+        first_filter, second_filter = filter_functions
+        for packet_data in packet_stream:
+            if first_filter(packet_data) and second_filter(packet_data):
+                yield packet_data
+        return
     for packet_data in packet_stream:
-        # Check if packet passes all filters
-        if all(filter_func(packet_data) for filter_func in filter_functions):
+        # Check if packet passes all filters, stopping at the first that rejects it.
+        # A plain loop avoids creating an all(...) generator for every packet.
+        for filter_func in filter_functions:
+            if not filter_func(packet_data):
+                break
+        else:
             yield packet_data
 
 
@@ -259,8 +601,7 @@ def filter_small_packets(packet_data: packet_data_type, max_size=1000):
     Returns:
         bool: True if packet.size < max_size, False otherwise
     """
-    packet_no, packet = packet_data
-    return packet.size < max_size
+    return packet_data[1].size < max_size
 
 
 def filter_large_packets(packet_data: packet_data_type, min_size=500):
@@ -274,8 +615,7 @@ def filter_large_packets(packet_data: packet_data_type, min_size=500):
     Returns:
         bool: True if packet.size > min_size, False otherwise
     """
-    packet_no, packet = packet_data
-    return packet.size > min_size
+    return packet_data[1].size > min_size
 
 
 def filter_by_pts_range(packet_data: packet_data_type, min_pts=0, max_pts=None):
@@ -297,6 +637,98 @@ def filter_by_pts_range(packet_data: packet_data_type, min_pts=0, max_pts=None):
         return packet.pts >= min_pts
     return min_pts <= packet.pts <= max_pts
 
+def filter_keyframes(packet_data: packet_data_type):
+    """
+    Filter function that returns True for keyframe packets.
+    Keyframes decode on their own, so sampling only these skips decoding the rest of each GOP.
+    
+    Args:
+        packet_data: Tuple of (packet_no, packet)
+    
+    Returns:
+        bool: True if packet.is_keyframe, False otherwise
+    """
+    return packet_data[1].is_keyframe
+
+def make_size_filter(min_size: Optional[int] = None, max_size: Optional[int] = None) -> Callable[[packet_data_type], bool]:
+    """
+    Build a filter function for min_size < packet.size < max_size, with the bounds bound in
+    a closure. Unlike lambda p: filter_small_packets(p, max_size), each call is then a single
+    comparison with no extra function call or keyword arguments.
+    
+    Args:
+        min_size: Keep packets with size > min_size (None for no lower limit)
+        max_size: Keep packets with size < max_size (None for no upper limit)
+    
+    Returns:
+        Filter function taking (packet_no, packet)
+    """
+    if min_size is None and max_size is None:
+        return lambda packet_data: True
+    if min_size is None:
+        return lambda packet_data: packet_data[1].size < max_size
+    if max_size is None:
+        return lambda packet_data: packet_data[1].size > min_size
+    return lambda packet_data: min_size < packet_data[1].size < max_size
+
+def make_pts_filter(min_pts: int = 0, max_pts: Optional[int] = None) -> Callable[[packet_data_type], bool]:
+    """
+    Build a filter function equivalent to filter_by_pts_range(p, min_pts, max_pts), with the
+    range bound in a closure. Packets without PTS don't pass.
+    
+    Args:
+        min_pts: Minimum PTS value (inclusive)
+        max_pts: Maximum PTS value (inclusive, None for no upper limit)
+    
+    Returns:
+        Filter function taking (packet_no, packet)
+    """
+    if max_pts is None:
+        def pts_filter(packet_data: packet_data_type) -> bool:
+            pts = packet_data[1].pts
+            return pts is not None and pts >= min_pts
+    else:
+        def pts_filter(packet_data: packet_data_type) -> bool:
+            pts = packet_data[1].pts
+            return pts is not None and min_pts <= pts <= max_pts
+    return pts_filter
+
+def prefilter_packets(packet_stream: packet_data_iterator, min_size: Optional[int] = None,
+                      max_size: Optional[int] = None, pts_range: Optional[Tuple[int, Optional[int]]] = None,
+                      keyframes: Optional[bool] = None, batch_size: int = 256) -> packet_data_iterator:
+    """
+    Vectorized equivalent of chain_filters with filter_large_packets, filter_small_packets,
+    filter_by_pts_range and filter_keyframes: the conditions are evaluated as one numpy mask per PacketBatch
+    instead of calling Python filter functions for every packet.
+    
+    Args:
+        packet_stream: Iterator of (packet_no, packet) tuples
+        min_size: Keep packets with size > min_size (None for no lower limit)
+        max_size: Keep packets with size < max_size (None for no upper limit)
+        pts_range: (min_pts, max_pts) to keep packets with min_pts <= pts <= max_pts;
+            max_pts may be None for no upper limit. Packets without PTS are dropped.
+        keyframes: True to keep only keyframes, False to keep only non-keyframes (None for both)
+        batch_size: Number of packets read ahead and filtered together
+    
+    Yields:
+        The (packet_no, packet) tuples that pass all conditions, in stream order
+    """
+    for batch in iter_packet_batches(packet_stream, batch_size):
+        mask = np.ones(len(batch), dtype=bool)
+        if min_size is not None:
+            mask &= batch.sizes > min_size
+        if max_size is not None:
+            mask &= batch.sizes < max_size
+        if pts_range is not None:
+            min_pts, max_pts = pts_range
+            mask &= (batch.pts != NO_PTS) & (batch.pts >= min_pts)
+            if max_pts is not None:
+                mask &= batch.pts <= max_pts
+        if keyframes is not None:
+            mask &= batch.is_keyframe == keyframes
+        for i in np.flatnonzero(mask):
+            yield int(batch.packet_numbers[i]), batch.packets[i]
+
 def stream_frames_from_packet(packet_data: packet_data_type):
     """
     Decode packets using PyAV version 14.4.0 compatible API.
@@ -324,54 +756,47 @@ def stream_frames_from_packet(packet_data: packet_data_type):
     except Exception as e:
         print(f"      Error decoding packet: {e}")
 
-def decode_packet_to_frame_iterator(packet_data: packet_data_type) -> frame_data_iterator:
+def decode_packet_to_frame_iterator(packet_data: packet_data_type, codec_context: Optional[av.CodecContext] = None) -> frame_data_iterator:
     """
     Decode a packet to a frame iterator using PyAV version 14.4.0 compatible API.
+    Pass codec_context when decoding many packets so it isn't looked up from the packet each time.
     """
     packet_no, packet = packet_data
-    frames = []
-    for frame_no, frame in enumerate(decode_packet_to_frames(packet_data)):
+    frames, _ = decode_packet_to_frames_with_state(packet_data, codec_context)
+    for frame_no, frame in enumerate(frames):
         yield (packet_no, frame_no, frame)
 
 def decode_packet_stream_to_frame_stream(packet_data_iterator: packet_data_iterator) -> frame_data_iterator:
     """
     Decode a packet stream to a frame stream using PyAV version 14.4.0 compatible API.
+    The codec context is taken from the first packet and reused for the rest of the stream.
     """
+    codec_context = None
     for packet_data in packet_data_iterator:
-        yield from decode_packet_to_frame_iterator(packet_data)
+        if codec_context is None:
+            codec_context = packet_data[1].stream.codec_context
+        yield from decode_packet_to_frame_iterator(packet_data, codec_context)
 
-def decode_packet_to_frames(packet_data: packet_data_type) -> frame_list_type:
+def decode_packet_to_frames(packet_data: packet_data_type, codec_context: Optional[av.CodecContext] = None) -> frame_list_type:
     """
     Decode a packet to a list of frames using PyAV version 14.4.0 compatible API.
     Note: This function doesn't handle decoder flushing - use decode_all_packets_with_flush instead.
     
     Args:
         packet_data: Tuple of (packet_no, packet)
+        codec_context: Optional codec context to decode with (default: the packet's stream's)
     
     Returns:
         List of decoded video frames
     """
-    packet_no, packet = packet_data
-    frames = []
-    
-    # Get the codec context from the stream
-    codec_context = packet.stream.codec_context
-    
-    # Decode the packet using the older API
-    try:
-        decoded_frames = codec_context.decode(packet)
-        frames = list(decoded_frames)
-    except Exception as e:
-        # Don't print every error - only print occasionally to avoid spam
-        if packet_no % 10 == 0:  # Print every 10th error
-            print(f"Error decoding packet {packet_no}: {e}")
-    
+    frames, _ = decode_packet_to_frames_with_state(packet_data, codec_context)
     return frames
 
 def decode_packet_to_frames_with_state(packet_data: packet_data_type, codec_context: Optional[av.CodecContext] = None) -> Tuple[frame_list_type, av.CodecContext]:
     """
     Decode a packet to a list of frames while maintaining decoder state.
-    This is better than decode_packet_to_frames for individual packet decoding.
+    This is the single decode path; decode_packet_to_frames and
+    decode_all_packets_with_flush are built on top of it.
     
     Args:
         packet_data: Tuple of (packet_no, packet)
@@ -387,12 +812,12 @@ def decode_packet_to_frames_with_state(packet_data: packet_data_type, codec_cont
     if codec_context is None:
         codec_context = packet.stream.codec_context
     
-    # Decode the packet using the older API
+    # decode() sends the packet and drains every frame the decoder has ready in one call,
+    # and already returns a list, so there is nothing to copy
     try:
-        decoded_frames = codec_context.decode(packet)
-        frames = list(decoded_frames)
+        frames = codec_context.decode(packet)
     except Exception as e:
-        print(f"Error decoding packet {packet_no}: {e}")
+        logger.warning("Error decoding packet %d: %s", packet_no, e)
     
     return frames, codec_context
 
@@ -413,6 +838,78 @@ def iterate_frames_from_packet_stream(packet_data_iterator: packet_data_iterator
             yield (packet_no, frame_count, frame)
    
 
+# Formats whose single plane holds exactly one byte per channel per pixel, so frame_to_np can
+# copy the plane directly; value is the channel count (1 gives an (H, W) array)
+PACKED_NDARRAY_CHANNELS = {"rgb24": 3, "bgr24": 3, "rgba": 4, "bgra": 4, "gray": 1}
+
+def frame_to_np(frame: av.VideoFrame, format: str = "rgb24", out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Convert a frame to a numpy array like frame.to_ndarray(format=format), optionally
+    writing into a caller-provided array (e.g. one slot of a preallocated batch) instead of
+    allocating a new one. For the formats in PACKED_NDARRAY_CHANNELS the converted frame's
+    plane is copied once, straight into out; other formats go through to_ndarray().
+    
+    Args:
+        frame: The frame to convert
+        format: Pixel format of the result
+        out: Array to write the result into; must have the result's shape and dtype
+    
+    Returns:
+        out if given, otherwise a new array
+    """
+    if frame.format.name != format:
+        frame = frame.reformat(format=format)
+    channels = PACKED_NDARRAY_CHANNELS.get(format)
+    if channels is None:
+        # Planar, subsampled, padded-pixel or high bit depth: leave the layout to PyAV
+        array = frame.to_ndarray()
+        if out is None:
+            return array
+        out[...] = array
+        return out
+    plane = frame.planes[0]
+    # Rows of the plane can be padded past width * channels, so slice the padding off
+    rows = np.frombuffer(plane, dtype=np.uint8).reshape(frame.height, plane.line_size)[:, :frame.width * channels]
+    shape = (frame.height, frame.width) if channels == 1 else (frame.height, frame.width, channels)
+    if out is None:
+        return rows.reshape(shape).copy()
+    out[...] = rows.reshape(shape)
+    return out
+
+def decode_frame_batches(packet_data_iterator: packet_data_iterator, format: str = "rgb24") -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Decode a packet stream into one numpy batch per GOP, for consumers that work on whole
+    arrays instead of (packet_no, frame_no, frame) tuples (see iterate_frames_from_packet_stream).
+    A batch starts at each decoded keyframe. Each batch is allocated once and every frame is
+    converted straight into its slot (see frame_to_np).
+    
+    Args:
+        packet_data_iterator: Iterator of (packet_no, packet) tuples
+        format: Pixel format of the frames, e.g. "rgb24", "bgr24" or "gray"
+    
+    Yields:
+        Tuple of (pts, frames): an int64 array of the frames' PTS (NO_PTS where missing)
+        and the frames stacked into one (N, H, W, ...) array
+    """
+    def to_batch(gop_frames: frame_list_type) -> Tuple[np.ndarray, np.ndarray]:
+        pts = np.fromiter((NO_PTS if frame.pts is None else frame.pts for frame in gop_frames), dtype=np.int64, count=len(gop_frames))
+        first = frame_to_np(gop_frames[0], format)
+        batch = np.empty((len(gop_frames),) + first.shape, dtype=first.dtype)
+        batch[0] = first
+        for i in range(1, len(gop_frames)):
+            frame_to_np(gop_frames[i], format, out=batch[i])
+        return pts, batch
+    
+    gop_frames: frame_list_type = []
+    for _, frames in decode_all_packets_with_flush(packet_data_iterator):
+        for frame in frames:
+            if frame.key_frame and gop_frames:
+                yield to_batch(gop_frames)
+                gop_frames = []
+            gop_frames.append(frame)
+    if gop_frames:
+        yield to_batch(gop_frames)
+
 def decode_all_packets_with_flush(packet_iterator, max_packets=None):
     """
     Decode all packets with proper flushing at the end.
@@ -427,39 +924,34 @@ def decode_all_packets_with_flush(packet_iterator, max_packets=None):
     """
     packet_count = 0
     codec_context = None
+    if max_packets:
+        # islice stops pulling packets at the limit, instead of a count check per packet
+        packet_iterator = islice(packet_iterator, max_packets)
     
     try:
         for packet_data in packet_iterator:
-            packet_no, packet = packet_data
-            
-            # Get codec context from first packet
-            if codec_context is None:
-                codec_context = packet.stream.codec_context
-            
-            # Decode this packet
-            frames = decode_packet_to_frames(packet_data)
-            yield (packet_no, frames)
-            
+            # Decode this packet, reusing the codec context picked up from the first one
+            frames, codec_context = decode_packet_to_frames_with_state(packet_data, codec_context)
+            yield (packet_data[0], frames)
             packet_count += 1
-            if max_packets and packet_count >= max_packets:
-                break
         
         # Flush the decoder to get remaining frames
         if codec_context:
-            print(f"Flushing decoder after {packet_count} packets...")
+            logger.debug("Flushing decoder after %d packets...", packet_count)
             remaining_frames = flush_decoder(codec_context)
             if remaining_frames:
-                print(f"Got {len(remaining_frames)} remaining frames from flush")
+                logger.debug("Got %d remaining frames from flush", len(remaining_frames))
                 yield (-1, remaining_frames)  # Use -1 to indicate flushed frames
                 
     except Exception as e:
-        print(f"Error in decode_all_packets_with_flush: {e}")
+        logger.warning("Error in decode_all_packets_with_flush: %s", e)
         # Don't re-raise - just stop processing this iterator
 
 def flush_decoder(codec_context: av.CodecContext) -> frame_list_type:
     """
     Flush the decoder to get any remaining frames.
     For PyAV version 14.4.0, this sends None to the decoder.
+    The decoder is reset afterwards, so the same codec context can decode the next group.
     
     Args:
         codec_context: The codec context to flush
@@ -471,10 +963,15 @@ def flush_decoder(codec_context: av.CodecContext) -> frame_list_type:
     
     try:
         # Send None to flush the decoder
-        decoded_frames = codec_context.decode(None)
-        frames = list(decoded_frames)
+        frames = codec_context.decode(None)
+    except av.EOFError:
+        # Already drained, e.g. by the empty packet demux() ends with
+        pass
     except Exception as e:
-        print(f"Error during decoder flush: {e}")
+        logger.warning("Error during decoder flush: %s", e)
+    finally:
+        # After draining, the decoder rejects new packets with EOF until it is reset
+        codec_context.flush_buffers()
     
     return frames
 
@@ -496,15 +993,17 @@ def decode_group_with_seek(filename: str, group_packets: List[packet_data_type])
     # Get the PTS of the first packet in the group
     first_packet_no, first_packet = group_packets[0]
     if first_packet.pts is None:
-        print(f"Warning: First packet {first_packet_no} has no PTS, skipping group")
+        logger.warning("First packet %d has no PTS, skipping group", first_packet_no)
         return []
     
-    # Create a set of packet numbers we want to keep
-    target_packet_numbers = {packet_no for packet_no, _ in group_packets}
+    # Demuxed packets are matched to the group by PTS, with a set lookup per packet
+    target_pts = {packet.pts for _, packet in group_packets if packet.pts is not None}
+    last_pts = group_packets[-1][1].pts
     
     # Open the file and seek to the nearest previous keyframe
     container = av.open(filename, mode='r')
     video_stream = container.streams.video[0]
+    discard_other_streams(container, video_stream)
     
     try:
         # Seek to the nearest previous keyframe before the first packet
@@ -519,36 +1018,27 @@ def decode_group_with_seek(filename: str, group_packets: List[packet_data_type])
                 continue
             
             # Check if this packet corresponds to one in our target group
-            # We need to map the demuxed packet back to our packet numbering
-            # For now, we'll use a simple approach: check if PTS matches
-            packet_matches = False
-            for target_packet_no, target_packet in group_packets:
-                if target_packet.pts == packet.pts:
-                    packet_matches = True
-                    break
-            
-            if packet_matches:
+            if packet.pts in target_pts:
                 # Decode this packet
                 try:
+                    # decode() returns a list, so it can be both extended from and counted
                     decoded_frames = codec_context.decode(packet)
-                    frames.extend(list(decoded_frames))
-                    print(f"Decoded packet with PTS {packet.pts}: {len(list(decoded_frames))} frames")
+                    frames.extend(decoded_frames)
+                    logger.debug("Decoded packet with PTS %d: %d frames", packet.pts, len(decoded_frames))
                 except Exception as e:
-                    print(f"Error decoding packet with PTS {packet.pts}: {e}")
+                    logger.warning("Error decoding packet with PTS %d: %s", packet.pts, e)
             
             # Stop if we've passed the last packet in our group
-            last_packet_no, last_packet = group_packets[-1]
-            if last_packet.pts is not None and packet.pts is not None and packet.pts > last_packet.pts:
+            if last_pts is not None and packet.pts > last_pts:
                 break
         
         # Flush the decoder to get any remaining frames
         try:
             remaining_frames = codec_context.decode(None)
-            frames.extend(list(remaining_frames))
-            if remaining_frames:
-                print(f"Got {len(list(remaining_frames))} remaining frames from flush")
+            frames.extend(remaining_frames)
+            logger.debug("Got %d remaining frames from flush", len(remaining_frames))
         except Exception as e:
-            print(f"Error during decoder flush: {e}")
+            logger.warning("Error during decoder flush: %s", e)
         
         return frames
         
@@ -579,7 +1069,7 @@ def group_packets_by_pts_and_decode(filename: str, packet_stream, filter_func) -
         else:
             # Packet doesn't match filter, process current group if it exists
             if group:
-                print(f"Processing group with {len(group)} packets")
+                logger.debug("Processing group with %d packets", len(group))
                 frames = decode_group_with_seek(filename, group)
                 if frames:
                     yield frames
@@ -587,12 +1077,13 @@ def group_packets_by_pts_and_decode(filename: str, packet_stream, filter_func) -
     
     # Process the last group if it exists
     if group:
-        print(f"Processing final group with {len(group)} packets")
+        logger.debug("Processing final group with %d packets", len(group))
         frames = decode_group_with_seek(filename, group)
         if frames:
             yield frames
 
-def group_packets_by_pts_and_decode_streaming(filename: str, packet_stream, filter_func) -> Iterator[frame_list_type]:
+def group_packets_by_pts_and_decode_streaming(filename: str, packet_stream, filter_func: Optional[Callable[[packet_data_type], bool]], bookend: Optional[int] = None,
+                                                max_workers: int = 1, codec_name: Optional[str] = None) -> Iterator[frame_list_type]:
     """
     Group packets by filter criteria and decode each group using seek-and-decode.
     This is a true streaming approach that doesn't store packets in memory.
@@ -600,7 +1091,16 @@ def group_packets_by_pts_and_decode_streaming(filename: str, packet_stream, filt
     Args:
         filename: Path to the video file
         packet_stream: Iterator of (packet_no, packet) tuples
-        filter_func: Function that takes (packet_no, packet) and returns bool
+        filter_func: Function that takes (packet_no, packet) and returns bool, or None
+            if packet_stream is already filtered (every packet counts; no call per packet)
+        bookend: If given, keep only the first and last bookend frames of each group
+            (see keep_bookend_frames), e.g. for bookend thumbnail sampling
+        max_workers: Number of GOPs decoded at the same time. Each worker thread decodes the
+            groups of one GOP at a time from its own container, and PyAV releases the GIL while
+            decoding, so workers run in parallel. Groups are still yielded in order, and at most
+            max_workers GOPs are decoded ahead of the consumer.
+        codec_name: Decoder to use instead of the stream's default one, e.g. "h264_cuvid", or
+            "auto" for the codec's dedicated hardware decoder (see select_stream_decoder)
     
     Yields:
         List of decoded frames for each group
@@ -613,7 +1113,7 @@ def group_packets_by_pts_and_decode_streaming(filename: str, packet_stream, filt
     for packet_data in packet_stream:
         packet_no, packet = packet_data
         
-        if filter_func(packet_data):
+        if filter_func is None or filter_func(packet_data):
             # Packet matches filter
             if current_group_start is None:
                 # Start of a new group
@@ -630,19 +1130,186 @@ def group_packets_by_pts_and_decode_streaming(filename: str, packet_stream, filt
     if current_group_start is not None:
         group_boundaries.append((current_group_start, current_group_end))
     
-    # Second pass: process each group individually using seek-and-decode
-    for i, (start_info, end_info) in enumerate(group_boundaries):
-        start_packet_no, start_pts = start_info
-        end_packet_no, end_pts = end_info
-        
-        print(f"Processing group {i+1}/{len(group_boundaries)}: packets {start_packet_no}-{end_packet_no}, PTS {start_pts}-{end_pts}")
-        
-        # Decode this group using seek-and-decode
-        frames = decode_group_by_pts_range(filename, start_pts, end_pts)
-        if frames:
-            yield frames
+    # Second pass: decode the groups by PTS range, seeking to each one's keyframe as needed
+    pts_ranges = [(start_pts, end_pts) for (_, start_pts), (_, end_pts) in group_boundaries]
+    
+    def log_group(i: int):
+        if logger.isEnabledFor(logging.DEBUG):
+            (start_packet_no, start_pts), (end_packet_no, end_pts) = group_boundaries[i]
+            logger.debug("Decoded group %d/%d: packets %d-%d, PTS %s-%s",
+                         i + 1, len(group_boundaries), start_packet_no, end_packet_no, start_pts, end_pts)
+    
+    if max_workers <= 1:
+        # One container for all groups, so groups in the same GOP don't each seek and re-read it
+        for i, frames in enumerate(decode_groups_by_pts_range(filename, pts_ranges, bookend, codec_name=codec_name)):
+            log_group(i)
+            if frames:
+                yield frames
+        return
+    
+    # Groups in different GOPs share no decoder state, so each GOP's groups are one task: they are
+    # decoded together through one container (see decode_groups_by_pts_range), and GOPs in parallel
+    keyframes = scan_keyframes(filename)
+    tasks = [[i for i, _ in gop_groups]
+             for _, gop_groups in groupby(enumerate(pts_ranges), key=lambda item: bisect_right(keyframes, item[1][0]))]
+    
+    # Each worker thread opens (and probes) the file and selects its decoder once, then seeks
+    # within it for all its tasks
+    worker_state = threading.local()
+    containers: List[av.container.InputContainer] = []
+    
+    def decode_task(group_indices: List[int]) -> List[frame_list_type]:
+        if not hasattr(worker_state, "container"):
+            worker_state.container = av.open(filename, mode='r')
+            containers.append(worker_state.container)
+            worker_state.codec_context = select_stream_decoder(worker_state.container.streams.video[0], codec_name)
+        return list(decode_groups_by_pts_range(filename, [pts_ranges[i] for i in group_indices], bookend, keyframes,
+                                               worker_state.container, codec_name, worker_state.codec_context))
+    
+    def results(future, group_indices: List[int]) -> Iterator[frame_list_type]:
+        for i, frames in zip(group_indices, future.result()):
+            log_group(i)
+            if frames:
+                yield frames
+    
+    # VideoFrames can't be pickled, so the workers are threads rather than processes
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            try:
+                for group_indices in tasks:
+                    pending.append((executor.submit(decode_task, group_indices), group_indices))
+                    if len(pending) >= max_workers:
+                        yield from results(*pending.popleft())
+                while pending:
+                    yield from results(*pending.popleft())
+            finally:
+                # The consumer stopped early: don't start the GOPs it will never see
+                for future, _ in pending:
+                    future.cancel()
+    finally:
+        # The workers are done (the executor waited for them), so their containers can go
+        for container in containers:
+            container.close()
+
+def iterate_in_background(iterable: Iterable, maxsize: int = 4) -> Iterator:
+    """
+    Iterate iterable on a background thread, up to maxsize items ahead of the consumer.
+    Useful for overlapping decoding (PyAV releases the GIL) with work on the decoded frames.
+    Exceptions from the producer are re-raised in the consumer. When the consumer stops
+    early the thread is stopped and joined before returning.
+    """
+    results: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    break
+                results.put(item)
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    item = None
+    try:
+        while True:
+            item = results.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        while item is not done:  # Unblock the producer if it is waiting on a full queue
+            item = results.get()
+        worker.join()
+
+def keep_bookend_frames(frames: Iterable[av.VideoFrame], bookend: int) -> frame_list_type:
+    """
+    Keep the first and last bookend frames of a frame stream.
+    Frames in between are dropped as soon as they're decoded, so at most 2*bookend
+    frames are held at once instead of the whole group.
+    """
+    frames = iter(frames)
+    head = list(islice(frames, bookend))
+    tail = deque(frames, maxlen=bookend)
+    return head + list(tail)
 
-def decode_group_by_pts_range(filename: str, start_pts: int, end_pts: int) -> frame_list_type:
+class FrameCache:
+    """
+    LRU cache of decoded frame groups, bounded by the total size of the frames' buffers.
+    Safe to share between the threads that decode groups in parallel. A max_bytes of 0 disables it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[frame_list_type, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def frames_nbytes(frames: frame_list_type) -> int:
+        return sum(plane.buffer_size for frame in frames for plane in frame.planes)
+
+    def get(self, key: Hashable) -> Optional[frame_list_type]:
+        """The cached frames for key (as a new list), or None on a miss."""
+        if self.max_bytes <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return list(entry[0])
+
+    def put(self, key: Hashable, frames: frame_list_type):
+        """Store frames under key, evicting the least recently used groups to stay within max_bytes."""
+        if self.max_bytes <= 0:
+            return
+        nbytes = self.frames_nbytes(frames)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (list(frames), nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+# Groups decoded by decode_group_by_pts_range, so repeated views of the same range (e.g. several
+# sampling strategies over the same groups) skip the decode. Disabled by default, since it keeps
+# the decoded frames alive: opt in with e.g. group_frame_cache.max_bytes = 256 * 1024 * 1024.
+group_frame_cache = FrameCache(max_bytes=0)
+
+def _group_cache_key(filename: str, start_pts: int, end_pts: int, bookend: Optional[int], codec_name: Optional[str]) -> Hashable:
+    """group_frame_cache key for a decoded PTS range of a file, invalidated when the file changes."""
+    return (os.path.abspath(filename), os.path.getmtime(filename), start_pts, end_pts, bookend, codec_name)
+
+def _collect_frames(frames: Iterable[av.VideoFrame], bookend: Optional[int]) -> frame_list_type:
+    """Collect a decoded group, keeping only its bookend frames if bookend is given."""
+    if bookend is not None:
+        return keep_bookend_frames(frames, bookend)
+    return list(frames)
+
+def decode_group_by_pts_range(filename: str, start_pts: int, end_pts: int, bookend: Optional[int] = None,
+                              codec_name: Optional[str] = None,
+                              container: Optional[av.container.InputContainer] = None,
+                              codec_context: Optional[av.CodecContext] = None) -> frame_list_type:
     """
     Decode frames for packets within a PTS range by seeking to the nearest previous keyframe.
     
@@ -650,53 +1317,162 @@ def decode_group_by_pts_range(filename: str, start_pts: int, end_pts: int) -> fr
         filename: Path to the video file
         start_pts: Start PTS (inclusive)
         end_pts: End PTS (inclusive)
+        bookend: If given, return only the first and last bookend frames of the range.
+            Every frame is still decoded (later frames reference earlier ones), but the
+            middle ones are released immediately.
+        codec_name: Decoder to use instead of the stream's default one, e.g. "h264_cuvid", or
+            "auto" for the codec's dedicated hardware decoder (see select_stream_decoder)
+        container: An open container of filename to decode through, e.g. one kept across calls.
+            It is left open; by default a container is opened and closed here.
+        codec_context: The decoder for container's video stream to reuse across calls, as returned
+            by select_stream_decoder(stream, codec_name); by default one is selected here
     
     Returns:
-        List of decoded frames in the PTS range
+        List of decoded frames in the PTS range. When group_frame_cache is enabled, repeated calls
+        for the same file (unchanged since) and range are served from it.
     """
+    cache_key = _group_cache_key(filename, start_pts, end_pts, bookend, codec_name)
+    cached = group_frame_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     # Open the file and seek to the nearest previous keyframe
-    container = av.open(filename, mode='r')
+    owns_container = container is None
+    if owns_container:
+        container = av.open(filename, mode='r')
     video_stream = container.streams.video[0]
+    discard_other_streams(container, video_stream)
+    if codec_context is None:
+        codec_context = select_stream_decoder(video_stream, codec_name)
+    enable_threaded_decoding(codec_context, thread_type="SLICE")
     
     try:
         # Seek to the nearest previous keyframe before the start PTS
         container.seek(start_pts, any_frame=False, backward=True, stream=video_stream)
-        
-        frames = []
-        codec_context = video_stream.codec_context
-        
-        # Demux and decode from the seek position
-        for packet in container.demux(video_stream):
-            if packet.pts is None:
-                continue
-            
-            # Check if this packet is within our target PTS range
-            if start_pts <= packet.pts <= end_pts:
-                # Decode this packet
-                try:
-                    decoded_frames = codec_context.decode(packet)
-                    frames.extend(list(decoded_frames))
-                    print(f"Decoded packet with PTS {packet.pts}: {len(list(decoded_frames))} frames")
-                except Exception as e:
-                    print(f"Error decoding packet with PTS {packet.pts}: {e}")
-            
-            # Stop if we've passed the end PTS
-            if packet.pts > end_pts:
-                break
-        
-        # Flush the decoder to get any remaining frames
-        try:
-            remaining_frames = codec_context.decode(None)
-            frames.extend(list(remaining_frames))
-            if remaining_frames:
-                print(f"Got {len(list(remaining_frames))} remaining frames from flush")
-        except Exception as e:
-            print(f"Error during decoder flush: {e}")
-        
+        if codec_context is not video_stream.codec_context:
+            # seek() only resets the stream's own decoder
+            codec_context.flush_buffers()
+        frames = _collect_frames(_decode_pts_range(container.demux(video_stream), codec_context, start_pts, end_pts), bookend)
+        group_frame_cache.put(cache_key, frames)
         return frames
         
     finally:
-        container.close()
+        if owns_container:
+            container.close()
+
+def _scan_keyframes(container: av.container.InputContainer, video_stream: av.stream.Stream) -> List[int]:
+    """Demux the whole stream (without decoding) and return the sorted PTS of its keyframes."""
+    return sorted(packet.pts for packet in container.demux(video_stream) if packet.is_keyframe and packet.pts is not None)
+
+def scan_keyframes(filename: str) -> List[int]:
+    """Sorted PTS of the keyframes of a file's video stream, from a demux-only pass."""
+    # metadata_only: no hardware device, decoder threads or demuxer probe buffering are set up
+    frame_iterator = FileFrameIterator(filename, metadata_only=True)
+    try:
+        return sorted(info.pts for _, info in frame_iterator.packet_iterator if info.is_keyframe and info.pts is not None)
+    finally:
+        frame_iterator.close()
+
+def decode_groups_by_pts_range(filename: str, pts_ranges: Iterable[Tuple[int, int]], bookend: Optional[int] = None,
+                               keyframes: Optional[List[int]] = None,
+                               container: Optional[av.container.InputContainer] = None,
+                               codec_name: Optional[str] = None,
+                               codec_context: Optional[av.CodecContext] = None) -> Iterator[frame_list_type]:
+    """
+    Decode several PTS ranges of a file in order, like decode_group_by_pts_range for each one,
+    but through a single container and decoder. The file's keyframes are indexed once up front;
+    when a range starts after the previous one, in the same GOP, demuxing simply continues
+    instead of seeking back to the keyframe and re-reading the GOP from its start.
+    
+    Args:
+        filename: Path to the video file
+        pts_ranges: (start_pts, end_pts) pairs, both inclusive, in stream order
+        bookend: If given, keep only the first and last bookend frames of each range
+        keyframes: The file's keyframe PTS, sorted (see scan_keyframes), if already known
+        container: An open container of filename to decode through, e.g. one kept per worker
+            across calls. It is left open; by default a container is opened and closed here.
+        codec_name: Decoder to use instead of the stream's default one, see decode_group_by_pts_range
+        codec_context: The decoder for container's video stream to reuse across calls, e.g. one kept
+            per worker next to container (see select_stream_decoder); by default one is selected here
+    
+    Yields:
+        List of decoded frames for each range, also stored in group_frame_cache when it is enabled
+    """
+    owns_container = container is None
+    if owns_container:
+        container = av.open(filename, mode='r')
+    video_stream = container.streams.video[0]
+    discard_other_streams(container, video_stream)
+    if codec_context is None:
+        codec_context = select_stream_decoder(video_stream, codec_name)
+    enable_threaded_decoding(codec_context, thread_type="SLICE")
+    
+    try:
+        if keyframes is None:
+            keyframes = _scan_keyframes(container, video_stream)
+        packets: Optional[Iterator[av.Packet]] = None  # Demuxer position after the last decoded range
+        last_end_pts = None
+        for start_pts, end_pts in pts_ranges:
+            cache_key = _group_cache_key(filename, start_pts, end_pts, bookend, codec_name)
+            frames = group_frame_cache.get(cache_key)
+            if frames is None:
+                same_gop = (last_end_pts is not None and start_pts > last_end_pts and
+                            bisect_right(keyframes, start_pts) == bisect_right(keyframes, last_end_pts))
+                if same_gop:
+                    # Every packet between here and the range's keyframe has PTS <= last_end_pts,
+                    # so seeking back would only re-read packets _decode_pts_range skips anyway
+                    codec_context.flush_buffers()
+                else:
+                    container.seek(start_pts, any_frame=False, backward=True, stream=video_stream)
+                    if codec_context is not video_stream.codec_context:
+                        # seek() only resets the stream's own decoder
+                        codec_context.flush_buffers()
+                    packets = container.demux(video_stream)
+                overflow: List[av.Packet] = []
+                frames = _collect_frames(_decode_pts_range(packets, codec_context, start_pts, end_pts, overflow), bookend)
+                # The packet that ended the range was demuxed but not decoded; the next range starts there
+                packets = chain(overflow, packets)
+                last_end_pts = end_pts
+                group_frame_cache.put(cache_key, frames)
+            yield frames
+    finally:
+        if owns_container:
+            container.close()
+
+def _decode_pts_range(packets: Iterator[av.Packet], codec_context: av.CodecContext, start_pts: int, end_pts: int,
+                      overflow: Optional[List[av.Packet]] = None) -> Iterator[av.VideoFrame]:
+    """
+    Yield the frames of the packets with start_pts <= PTS <= end_pts, demuxing from the current position.
+    The first packet past end_pts is appended to overflow, if given, so the caller can continue from it.
+    """
+    # Demux and decode from the seek position
+    for packet in packets:
+        if packet.pts is None:
+            continue
+        
+        # Check if this packet is within our target PTS range
+        if start_pts <= packet.pts <= end_pts:
+            # Decode this packet
+            try:
+                decoded_frames = codec_context.decode(packet)
+                logger.debug("Decoded packet with PTS %d: %d frames", packet.pts, len(decoded_frames))
+                yield from decoded_frames
+            except Exception as e:
+                logger.warning("Error decoding packet with PTS %d: %s", packet.pts, e)
+        
+        # Stop if we've passed the end PTS
+        if packet.pts > end_pts:
+            if overflow is not None:
+                overflow.append(packet)
+            break
+    
+    # Flush the decoder to get any remaining frames
+    try:
+        remaining_frames = codec_context.decode(None)
+        logger.debug("Got %d remaining frames from flush", len(remaining_frames))
+        yield from remaining_frames
+    except Exception as e:
+        logger.warning("Error during decoder flush: %s", e)
 
 
 def get_packet_iterator_from_file(filename):